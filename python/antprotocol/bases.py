@@ -22,8 +22,8 @@ class FitBitANT(ANTlibusb):
     PID = 0x84c4
     NAME = "FitBit"
 
-    def open(self, vid = None, pid = None):
-        if not super(FitBitANT, self).open(vid, pid):
+    def open(self, vid = None, pid = None, bus = None, address = None):
+        if not super(FitBitANT, self).open(vid, pid, bus, address):
             return False
         self.init()
         return True
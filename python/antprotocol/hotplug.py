@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+#################################################################
+# hotplug handling for ant bases
+# Part of the libfitbit project
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, 
+# with or without modification, are permitted provided 
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and 
+#      the following disclaimer in the documentation and/or 
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names 
+#      of its contributors may be used to endorse or promote 
+#      products derived from this software without specific 
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND 
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR 
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, 
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT 
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; 
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR 
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, 
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+#
+
+import threading
+import usb.core
+
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+class DeviceManager(object):
+    """Keeps a registry of attached ANT bases, keyed by USB (bus,
+    address). Bases are opened as soon as they're plugged in, and
+    on_attach/on_detach are called with the key and base, on_detach
+    before the base is closed.
+
+    Uses udev events through pyudev if it's installed. Without it, we
+    fall back to looking for bases every poll_interval seconds.
+
+    """
+
+    def __init__(self, base_classes, on_attach = None, on_detach = None,
+                 debug = False, poll_interval = 5):
+        #: (vid, pid) to base class
+        self.classes = dict([((bc.VID, bc.PID), bc) for bc in base_classes])
+        self.on_attach = on_attach
+        self.on_detach = on_detach
+        self.debug = debug
+        self.poll_interval = poll_interval
+        #: (bus, address) to opened base
+        self.bases = {}
+        self._cond = threading.Condition()
+        self._observer = None
+        self._poller = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Opens the bases that are already plugged in, then starts
+        watching for new ones.
+
+        """
+        self._stop.clear()
+        if pyudev is not None:
+            context = pyudev.Context()
+            monitor = pyudev.Monitor.from_netlink(context)
+            monitor.filter_by("usb", "usb_device")
+            # Start listening before we enumerate, so nothing plugged
+            # in between the two gets lost
+            self._observer = pyudev.MonitorObserver(monitor, callback = self._udev_event)
+            self._observer.daemon = True
+            self._observer.start()
+            for device in context.list_devices(subsystem = "usb", DEVTYPE = "usb_device"):
+                self._udev_event(device, "add")
+        else:
+            self._poll()
+            self._poller = threading.Thread(target = self._poll_loop)
+            self._poller.daemon = True
+            self._poller.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+
+    def wait_for_base(self, timeout = None):
+        """Returns an attached base, waiting up to timeout seconds (or
+        forever) for one to show up. Returns None on timeout.
+
+        """
+        with self._cond:
+            if not self.bases:
+                # Wait in short steps, a wait without timeout can't be
+                # interrupted with ctrl-c
+                waited = 0
+                while not self.bases and (timeout is None or waited < timeout):
+                    self._cond.wait(1)
+                    waited += 1
+            if not self.bases:
+                return None
+            return self.bases.values()[0]
+
+    def _udev_event(self, device, action = None):
+        if action is None:
+            action = device.action
+        # PRODUCT is vid/pid/bcdDevice in hex, and is there on
+        # remove events too, unlike the sysfs attributes
+        product = device.get("PRODUCT")
+        if not product or device.get("BUSNUM") is None:
+            return
+        (vid, pid) = [int(x, 16) for x in product.split("/")[0:2]]
+        key = (int(device.get("BUSNUM")), int(device.get("DEVNUM")))
+        if action == "add":
+            self._attach(key, vid, pid)
+        elif action == "remove":
+            self._detach(key)
+
+    def _poll(self):
+        seen = set()
+        for dev in usb.core.find(find_all = True):
+            key = (dev.bus, dev.address)
+            if (dev.idVendor, dev.idProduct) in self.classes:
+                seen.add(key)
+                if key not in self.bases:
+                    self._attach(key, dev.idVendor, dev.idProduct)
+        for key in self.bases.keys():
+            if key not in seen:
+                self._detach(key)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            self._poll()
+
+    def _attach(self, key, vid, pid):
+        base_class = self.classes.get((vid, pid))
+        if base_class is None or key in self.bases:
+            return
+        base = base_class(debug = self.debug)
+        try:
+            if not base.open(bus = key[0], address = key[1]):
+                return
+        except usb.core.USBError, e:
+            print "Failed to open %s base at %d:%d: %s" % (base.NAME, key[0], key[1], e)
+            return
+        print "Found %s base at %d:%d" % (base.NAME, key[0], key[1])
+        with self._cond:
+            self.bases[key] = base
+            self._cond.notify_all()
+        if self.on_attach is not None:
+            self.on_attach(key, base)
+
+    def _detach(self, key):
+        with self._cond:
+            base = self.bases.pop(key, None)
+        if base is None:
+            return
+        print "Lost %s base at %d:%d" % (base.NAME, key[0], key[1])
+        # Let whoever is using the base stop before it's closed
+        if self.on_detach is not None:
+            self.on_detach(key, base)
+        base.close()
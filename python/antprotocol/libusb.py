@@ -55,13 +55,19 @@ class ANTlibusb(ANT):
         self._connection = False
         self.timeout = 1000
 
-    def open(self, vid=None, pid=None):
+    def open(self, vid=None, pid=None, bus=None, address=None):
         if vid is None:
             vid = self.VID
         if pid is None:
             pid = self.PID
+        # bus and address pick out one base if there are several
+        # plugged in (see hotplug.DeviceManager)
+        match = {}
+        if bus is not None and address is not None:
+            match = {'bus': bus, 'address': address}
         self._connection = usb.core.find(idVendor=vid,
-                                         idProduct=pid)
+                                         idProduct=pid,
+                                         **match)
         if self._connection is None:
             return False
 
@@ -82,14 +88,16 @@ class ANTlibusb(ANT):
         ##self._check_reset_response(0x80)
         return True
 
+    def is_open(self):
+        return bool(self._connection)
+
     def close(self):
         if self._connection is not None:
             self._connection = None
 
     def _send(self, command):
-        # libusb expects ordinals, it'll redo the conversion itself.
-        c = command
-        self._connection.write(self.ep['out'], map(ord, c), 100)
+        # command is already a bytearray, which pyusb takes as is.
+        self._connection.write(self.ep['out'], command, 100)
 
     def _receive(self, size=4096):
         return self._connection.read(self.ep['in'], size, self.timeout)
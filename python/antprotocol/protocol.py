@@ -84,7 +84,7 @@ class ANT(object):
         self._chan = chan
 
         self._state = 0
-        self._receiveBuffer = []
+        self._receiveBuffer = bytearray()
 
     def _event_to_string(self, event):
         try:
@@ -204,6 +204,12 @@ class ANT(object):
         self._send_message(0x42, self._chan, 0x00, 0x00)
         self._check_ok_response()
 
+    @log
+    def request_message(self, msg_id):
+        # Only sends the request, the response (with msg_id as its
+        # message type) has to be picked up by the caller.
+        self._send_message(0x4d, self._chan, msg_id)
+
     @log
     def receive_acknowledged_reply(self, size = 13):
         for tries in range(30):
@@ -242,16 +248,16 @@ class ANT(object):
 
     @log
     def _check_burst_response(self):
-        response = []
+        response = bytearray()
         for tries in range(128):
             status = self._receive_message()
             if len(status) > 5 and status[2] == 0x40 and status[5] == 0x4:
                 raise ANTReceiveException("Burst receive failed by event!")
             elif len(status) > 4 and status[2] == 0x4f:
-                response = response + status[4:-1]
+                response += status[4:-1]
                 return response
             elif len(status) > 4 and status[2] == 0x50:
-                response = response + status[4:-1]
+                response += status[4:-1]
                 if status[3] & 0x80:
                     return response
         raise ANTReceiveException("Burst receive failed to detect end")
@@ -274,26 +280,25 @@ class ANT(object):
         return self._send_message(*[0x4e] + list(struct.unpack('%sB' % len(instring), instring)))
 
     def _send_message(self, *args):
-        data = list()
-        for l in list(args):
-            if isinstance(l, list):
-                data = data + l
+        # Messages are built in a single bytearray, which is also
+        # what gets handed to the USB layer.
+        data = bytearray((0xa4, 0x00))
+        for l in args:
+            if isinstance(l, (list, bytearray)):
+                data.extend(l)
             else:
                 data.append(l)
-        data.insert(0, len(data) - 1)
-        data.insert(0, 0xa4)
+        data[1] = len(data) - 3
         data.append(reduce(operator.xor, data))
 
         if self._debug:
             print "    sent: " + hexRepr(data)
-        return self._send(map(chr, array.array('B', data)))
+        return self._send(data)
 
     def _find_sync(self, buf, start=0):
-        i = 0;
-        for v in buf:
-            if i >= start and (v == 0xa4 or v == 0xa5):
-                break
-            i = i + 1
+        syncs = [i for i in (buf.find('\xa4', start), buf.find('\xa5', start))
+                 if i >= 0]
+        i = min(syncs) if syncs else len(buf)
         if i != 0:
             if self._debug:
                 print "Searching for SYNC, discarding: " + hexRepr(buf[0:i])
@@ -309,7 +314,7 @@ class ANT(object):
                 # data[] too small, try to read some more
                 from usb.core import USBError
                 try:
-                    data += self._receive(size).tolist()
+                    data += self._receive(size).tostring()
                     timeouts = 0
                 except USBError:
                     timeouts = timeouts+1
@@ -321,8 +326,8 @@ class ANT(object):
                             data = self._find_sync(data, 2)
                         if len(data) == 0:
                             # Failed to find anything..
-                            self._receiveBuffer = []
-                            return []
+                            self._receiveBuffer = bytearray()
+                            return bytearray()
                 continue
             data = self._find_sync(data)
             if len(data) < l: continue
@@ -339,7 +344,8 @@ class ANT(object):
                     print "Checksum error for proposed packet: " + hexRepr(p)
                 data = self._find_sync(data, 1)
                 continue
-            self._receiveBuffer = data[l:]
+            del data[0:l]
+            self._receiveBuffer = data
             if self._debug:
                 print "received: " + hexRepr(p)
             return p
@@ -66,9 +66,56 @@
 # - Figuring out more data formats and packets
 # - Implementing data clearing
 
-import itertools, sys, random, operator, datetime, time
+import itertools, sys, random, operator, datetime, time, threading, binascii
 from antprotocol.bases import FitBitANT, DynastreamANT
 from antprotocol.protocol import ANTReceiveException
+from fitbit_records import decode_bank0, decode_bank1, decode_bank2, decode_bank6, incremental_decoder
+
+def xor_checksum(data):
+    """XOR of all the bytes in data. Longer data is folded in halves
+    as one big integer, rather than gone through a byte at a time.
+
+    """
+    if len(data) <= 32:
+        return reduce(operator.xor, data, 0)
+    size = 1
+    while size < len(data):
+        size *= 2
+    # Shorter data is just leading zero bytes, which don't change the XOR
+    value = int(binascii.hexlify(data), 16)
+    bits = size * 8
+    while bits > 8:
+        bits //= 2
+        value = (value >> bits) ^ (value & ((1 << bits) - 1))
+    return value
+
+def pack_payload_burst(packet_id, payload, chan = 0):
+    """Lays out the burst for sending payload to the tracker: a header
+    packet with the packet id, payload length and checksum, then the
+    payload in 8 byte packets, each prefixed with its sequence number
+    (0x20, 0x40, 0x60, ...), the last one flagged with 0x80 and zero
+    padded. Returns the 9 byte messages back to back, ready for
+    _send_burst_data.
+
+    """
+    payload = bytearray(payload)
+    size = len(payload)
+    packets = (size + 7) // 8
+    p = bytearray(9 * (packets + 1))
+    p[1] = packet_id
+    p[2] = 0x80
+    p[3] = size
+    p[8] = xor_checksum(payload)
+    if not packets:
+        return p
+    # Sequence bytes, then the payload a column at a time, all as
+    # slice assignments into p
+    p[9::9] = (bytearray([0x20 | chan, 0x40 | chan, 0x60 | chan]) * (packets // 3 + 1))[:packets]
+    p[-9] |= 0x80
+    payload.extend(bytearray(packets * 8 - size))
+    for column in range(8):
+        p[10 + column::9] = payload[column::8]
+    return p
 
 class FitBit(object):
     """Class to represent the fitbit tracker device, the portion of
@@ -77,17 +124,29 @@ class FitBit(object):
 
     """
 
+    #: Opcodes whose results can be fetched ahead of time: just 0x24
+    #: info. Data bank dumps (0x22) are never cached, since the
+    #: website erases the bank after it has seen the dump, and a stale
+    #: dump would lose whatever the tracker recorded in between.
+    CACHEABLE_OPCODES = (0x24,)
+    #: Seconds a prefetched opcode result stays usable
+    CACHE_MAX_AGE = 60
+    #: Times a lost data bank chunk is asked for again before the
+    #: transfer gives up
+    CHUNK_RETRIES = 3
+
     def __init__(self, base = None):
         #: Iterator cycle of 0-8, for creating tracker packet serial numbers
-        self.tracker_packet_count = itertools.cycle(range(0,8))
-
-        # The tracker expects to start on 1, i.e. 0x39 This is set
-        # after a reset (which is why we create the tracker in the
-        # reset function). It won't talk if you try anything else.
-        self.tracker_packet_count.next()
+        self.tracker_packet_count = None
+        self.reset_packet_count()
 
+        #: channel id the tracker was told to hop to, None until then
+        self.channel_id = None
         #: used to track which internal databank we're on when
         self.current_bank_id = 0
+        #: True while a data bank transfer is under way, and after one
+        #: fails part way (see get_data_bank)
+        self.dumping = False
         #: tracks current packet id for fitbit communication
         self.current_packet_id = None
         #: serial number of the tracker
@@ -106,9 +165,22 @@ class FitBit(object):
         self.in_mode_bsl = None
         #: True if tracker is currently on charger, False otherwise
         self.on_charger = None
+        #: prefetched opcode results, keyed by opcode string
+        self.opcode_cache = {}
+        #: held while talking to the tracker, so prefetches from
+        #: another thread don't interleave with opcodes
+        self.lock = threading.RLock()
 
         self.base = base
 
+    def reset_packet_count(self):
+        self.tracker_packet_count = itertools.cycle(range(0,8))
+
+        # The tracker expects to start on 1, i.e. 0x39 This is set
+        # after a reset (which is why we restart the count in
+        # reset_tracker). It won't talk if you try anything else.
+        self.tracker_packet_count.next()
+
     def gen_packet_id(self):
         """Generates the next packet id for information sent to the
         tracker.
@@ -174,12 +246,17 @@ class FitBit(object):
         self.base.send_acknowledged_data([0x78, 0x02] + cid + [0x00, 0x00, 0x00, 0x00])
         self.base.close_channel()
         self.init_device_channel(cid + [0x01, 0x01])
+        self.channel_id = cid
         self.wait_for_beacon()
         self.ping_tracker()
 
     def reset_tracker(self):
         # 0x78 0x01 is apparently the device reset command
+        self.channel_id = None
+        self.dumping = False
+        self.opcode_cache.clear()
         self.base.send_acknowledged_data([0x78, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+        self.reset_packet_count()
 
     def command_sleep(self):
         self.base.send_acknowledged_data([0x7f, 0x03, 0x00, 0x00, 0x00, 0x00, 0x00, 0x3c])
@@ -188,24 +265,65 @@ class FitBit(object):
         # FitBit device initialization
         print "Waiting for receive"
         for tries in range(75):
-            try:
-                d = self.base._receive_message()
-                if d[2] == 0x4E:
-                    return
-            except Exception:
-                pass
+            d = self.base._receive_message()
+            if len(d) > 2 and d[2] == 0x4E:
+                return
         raise ANTReceiveException("Failed to see tracker beacon")
 
     def _get_tracker_burst(self):
         d = self.base._check_burst_response()
-        if d[1] != 0x81:
-            raise Exception("Response received is not tracker burst! Got %s" % (d[0:2]))
+        if len(d) < 8 or d[1] != 0x81:
+            raise ANTReceiveException("Response received is not tracker burst! Got %s" % (list(d[0:2])))
+        if d[0] != self.current_packet_id:
+            # Left over from a request we already gave up on
+            raise ANTReceiveException("Tracker burst is for packet %02x, expected %02x" %
+                                      (d[0], self.current_packet_id))
         size = d[3] << 8 | d[2]
         if size == 0:
-            return []
+            return bytearray()
         return d[8:8+size]
 
-    def run_opcode(self, opcode, payload = None):
+    def run_opcode(self, opcode, payload = None, on_chunk = None, collect = True):
+        """Runs an opcode on the tracker and returns its result. For
+        data bank dumps, on_chunk is called with the bank id and data
+        of every chunk received, and with collect False the chunks
+        aren't also put together into the result.
+
+        """
+        opcode = bytearray(opcode)
+        with self.lock:
+            if payload is None and on_chunk is None:
+                cached = self.opcode_cache.pop(str(opcode), None)
+                if cached is not None and \
+                   time.time() - cached[0] <= self.CACHE_MAX_AGE:
+                    return cached[1]
+            self._invalidate_cache(opcode)
+            return self._run_opcode(opcode, payload, on_chunk, collect)
+
+    def prefetch_opcode(self, opcode):
+        """Runs a read only opcode and keeps the result, so the next
+        run_opcode call for it is answered without talking to the
+        tracker.
+
+        """
+        opcode = bytearray(opcode)
+        if opcode[0] not in self.CACHEABLE_OPCODES:
+            raise Exception("prefetch_opcode: opcode %s can't be cached" % (list(opcode)))
+        with self.lock:
+            if str(opcode) in self.opcode_cache:
+                return
+            data = self._run_opcode(opcode)
+            self.opcode_cache[str(opcode)] = (time.time(), data)
+
+    def _invalidate_cache(self, opcode):
+        if opcode[0] in self.CACHEABLE_OPCODES or opcode[0] == 0x22:
+            # Reading doesn't change what the tracker reports
+            return
+        # Anything else could
+        self.opcode_cache.clear()
+
+    def _run_opcode(self, opcode, payload = None, on_chunk = None, collect = True):
+        self.dumping = False
         for tries in range(4):
             try:
                 self.send_tracker_packet(opcode)
@@ -216,36 +334,24 @@ class FitBit(object):
                 print "Tracker Packet IDs don't match! %02x %02x" % (data[0], self.current_packet_id)
                 continue
             if data[1] == 0x42:
-                return self.get_data_bank()
+                return self.get_data_bank(on_chunk = on_chunk, collect = collect)
             if data[1] == 0x61:
                 # Send payload data to device
                 if payload is not None:
                     self.send_tracker_payload(payload)
                     data = self.base.receive_acknowledged_reply()
-                    data.pop(0)
+                    del data[0]
                     return data
-                raise Exception("run_opcode: opcode %s, no payload" % (opcode))
+                raise Exception("run_opcode: opcode %s, no payload" % (list(opcode)))
             if data[1] == 0x41:
-                data.pop(0)
+                del data[0]
                 return data
-        raise Exception("Failed to run opcode %s" % (opcode))
+        raise Exception("Failed to run opcode %s" % (list(opcode)))
 
     def send_tracker_payload(self, payload):
         # The first packet will be the packet id, the length of the
         # payload, and ends with the payload CRC
-        p = [0x00, self.gen_packet_id(), 0x80, len(payload), 0x00, 0x00, 0x00, 0x00, reduce(operator.xor, map(ord, payload))]
-        prefix = itertools.cycle([0x20, 0x40, 0x60])
-        for i in range(0, len(payload), 8):
-            current_prefix = prefix.next()
-            plist = []
-            if i+8 >= len(payload):
-                plist += [(current_prefix + 0x80) | self.base._chan]
-            else:
-                plist += [current_prefix | self.base._chan]
-            plist += map(ord, payload[i:i+8])
-            while len(plist) < 9:
-                plist += [0x0]
-            p += plist
+        p = pack_payload_burst(self.gen_packet_id(), payload, self.base._chan)
         # TODO: Sending burst data with a guessed sleep value, should
         # probably be based on channel timing
         self.base._send_burst_data(p, .01)
@@ -256,18 +362,68 @@ class FitBit(object):
         return data
 
     def send_tracker_packet(self, packet):
-        p = [self.gen_packet_id()] + packet
+        p = bytearray([self.gen_packet_id()])
+        p.extend(packet)
         self.base.send_acknowledged_data(p)
 
     def ping_tracker(self):
         self.base.send_acknowledged_data([0x78, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
 
     def check_tracker_data_bank(self, index, cmd):
-        self.send_tracker_packet([cmd, 0x00, 0x02, index, 0x00, 0x00, 0x00])
+        # Only the low byte of the bank id goes over the air
+        self.send_tracker_packet([cmd, 0x00, 0x02, index & 0xff, 0x00, 0x00, 0x00])
         return self._get_tracker_burst()
 
-    def run_data_bank_opcode(self, index):
-        return self.run_opcode([0x22, index, 0x00, 0x00, 0x00, 0x00, 0x00])
+    def get_data_bank_chunk(self, index, cmd):
+        for retries in range(self.CHUNK_RETRIES, -1, -1):
+            try:
+                return self.check_tracker_data_bank(index, cmd)
+            except ANTReceiveException, e:
+                if not retries:
+                    raise
+                print "Data bank chunk %d failed (%s), retrying" % (index, e)
+                self.drain_bursts()
+
+    def drain_bursts(self):
+        """Reads and drops whatever is still coming in, e.g. the rest
+        of a burst we gave up on, so it isn't taken for the reply to
+        the next request.
+
+        """
+        timeout = getattr(self.base, "timeout", None)
+        if timeout is not None:
+            # Just long enough to see nothing more is coming
+            self.base.timeout = min(timeout, 100)
+        try:
+            for messages in range(256):
+                if not self.base._receive_message():
+                    break
+        finally:
+            if timeout is not None:
+                self.base.timeout = timeout
+
+    def run_data_bank_opcode(self, index, on_chunk = None, collect = True):
+        return self.run_opcode([0x22, index, 0x00, 0x00, 0x00, 0x00, 0x00],
+                               on_chunk = on_chunk, collect = collect)
+
+    def run_data_bank_records(self, index, on_record = None):
+        """Dumps a data bank, decoding every chunk as it comes in
+        rather than the whole dump at the end. Returns the records, or
+        if on_record is given, calls it with each record as soon as
+        it's complete instead, holding on to neither the records nor
+        the dump.
+
+        """
+        decoder = incremental_decoder(index)
+        records = None
+        if on_record is None:
+            records = []
+            on_record = records.append
+        def decode_chunk(bank_id, chunk):
+            for record in decoder.feed(chunk):
+                on_record(record)
+        self.run_data_bank_opcode(index, on_chunk = decode_chunk, collect = False)
+        return records
 
     def erase_data_bank(self, index, tstamp=None):
         if tstamp is None: tstamp = int(time.time())
@@ -278,73 +434,167 @@ class FitBit(object):
                                 (tstamp & 0x000000ff),
                                 0x00])
 
-    def get_data_bank(self):
-        data = []
-        cmd = 0x70  # Send 0x70 on first burst
+    def get_data_bank(self, data = None, cmd = 0x70, on_chunk = None, collect = True):
+        """Reads data bank chunks until the tracker sends an empty one.
+        A chunk whose burst gets lost is asked for again, up to
+        CHUNK_RETRIES times, keeping everything received before it.
+        If the transfer still fails, current_bank_id points at the
+        chunk that failed, so it can be picked up again on the same
+        link by passing in the data received so far and cmd 0x60.
+
+        With collect False, chunks only go to on_chunk and data is
+        returned as it was passed in, so memory use doesn't grow with
+        the size of the dump.
+
+        """
+        if data is None:
+            data = bytearray()
+        self.dumping = True
+        # Send 0x70 on first burst
         for parts in range(2000):
-            bank = self.check_tracker_data_bank(self.current_bank_id, cmd)
+            bank = self.get_data_bank_chunk(self.current_bank_id, cmd)
+            if on_chunk is not None:
+                on_chunk(self.current_bank_id, bank)
             self.current_bank_id += 1
             cmd = 0x60  # Send 0x60 on subsequent bursts
             if len(bank) == 0:
+                self.dumping = False
                 return data
-            data = data + bank
+            if collect:
+                data += bank
         raise ANTReceiveException("Cannot complete data bank")
 
     def parse_bank2_data(self, data):
-        for i in range(0, len(data), 13):
-            print ["0x%.02x" % x for x in data[i:i+13]]
-            # First 4 bytes are seconds from Jan 1, 1970
-            print "Time: %s" % (datetime.datetime.fromtimestamp(data[i] | data[i + 1] << 8 | data[i + 2] << 16 | data[i + 3] << 24))
+        for record in decode_bank2(data):
+            print "Time: %s Data: %s" % \
+                  (datetime.datetime.fromtimestamp(record.timestamp), record.data)
 
     def parse_bank0_data(self, data):
-        # First 4 bytes are a time
-        i = 0
-        last_date_time = 0
-        time_index = 0
-        while i < len(data):
-            # Date is in bigendian. No, really. And I think it's
-            # because they're prefixing the 3 accelerometer reading
-            # bytes with 0x80, so they can & against it.
-            if not data[i] & 0x80:
-                last_date_time = data[i+3] | data[i+2] << 8 | data[i+1] << 16 | data[i] << 24
-                print "Time: %s" % (datetime.datetime.fromtimestamp(last_date_time))
-                i = i + 4
-                time_index = 0
-            else:
-                record_date = (datetime.datetime.fromtimestamp(last_date_time + 60 * time_index))
-                # steps are easy. It's just the last byte
-                steps = data[i+2]
-                # active score: second byte, subtract 10 (because METs
-                # start at 1 but 1 is subtracted per minute, see
-                # asterisk note on fitbit website, divide by 10.
-                active_score = (data[i+1] - 10) / 10.0
-                # first byte: I don't know. It starts at 0x81. So we at least subtract that.
-                not_sure = data[i] - 0x81
-                print "%s: ???: %d Active Score: %f Steps: %d" % (record_date, not_sure, active_score, steps)
-                i = i + 3
-                time_index = time_index + 1
+        for record in decode_bank0(data):
+            print "%s: ???: %d Active Score: %f Steps: %d" % \
+                  (datetime.datetime.fromtimestamp(record.timestamp),
+                   record.unknown, record.active_score, record.steps)
 
     def parse_bank1_data(self, data):
-        for i in range(0, len(data), 14):
-            print ["0x%.02x" % x for x in data[i:i+13]]
-            # First 4 bytes are seconds from Jan 1, 1970
-            daily_steps = data[i+7] << 8 | data[i+6]
-            record_date = datetime.datetime.fromtimestamp(data[i] | data[i + 1] << 8 | data[i + 2] << 16 | data[i + 3] << 24)
-            print "Time: %s Daily Steps: %d" % (record_date, daily_steps)
+        for record in decode_bank1(data):
+            print "Time: %s Daily Steps: %d" % \
+                  (datetime.datetime.fromtimestamp(record.timestamp), record.steps)
 
     def parse_bank6_data(self, data):
-        i = 0
-        tstamp = 0
-        while i < len(data):
-            if data[i] == 0x80:
-                floors = data[i+1] / 10
-                print "Time: %s: %d Floors" % (datetime.datetime.fromtimestamp(tstamp), floors)
-                i += 2
-                tstamp += 60
-                continue
-            d = data[i:i+4]
-            tstamp = d[3] | d[2] << 8 | d[1] << 16 | d[0] << 24
-            i += 4
+        for record in decode_bank6(data):
+            print "Time: %s: %d Floors" % \
+                  (datetime.datetime.fromtimestamp(record.timestamp), record.floors)
+
+class TrackerSession(object):
+    """Keeps the link to a tracker (hopped channel and packet ids)
+    open between opcodes and between syncs, so we only pay for the
+    base init, tracker reset and channel hop when the link is gone.
+
+    """
+
+    def __init__(self, fitbit, max_idle = 30, ping_after = 2):
+        self.fitbit = fitbit
+        #: seconds without traffic after which we don't bother
+        #: checking the link and just reinitialize
+        self.max_idle = max_idle
+        #: seconds without traffic after which we ping the tracker
+        #: before trusting the link
+        self.ping_after = ping_after
+        #: time of the last successful exchange, None if not linked
+        self.last_used = None
+        #: set when a data bank transfer failed part way, so the link
+        #: gets pinged before it's used to resume it
+        self.suspect = False
+
+    def is_open(self):
+        return self.last_used is not None and \
+               self.fitbit.channel_id is not None
+
+    def is_alive(self):
+        if not self.is_open():
+            return False
+        idle = time.time() - self.last_used
+        if idle > self.max_idle:
+            return False
+        if idle > self.ping_after or self.suspect:
+            try:
+                self.fitbit.ping_tracker()
+            except ANTReceiveException:
+                return False
+            self.last_used = time.time()
+            self.suspect = False
+        return True
+
+    def ensure(self):
+        """Makes sure we have a link to the tracker. Returns True if a
+        full reinitialization was needed.
+
+        """
+        if self.is_alive():
+            return False
+        self.invalidate()
+        self.fitbit.init_tracker_for_transfer()
+        self.last_used = time.time()
+        return True
+
+    def _failed(self):
+        # A data bank transfer that broke off part way can be picked
+        # up on the same link (see resume_data_bank). Anything else
+        # may have left our packet ids out of step with the tracker,
+        # which a ping wouldn't notice, so start over.
+        if self.fitbit.dumping:
+            self.suspect = True
+        else:
+            self.invalidate()
+
+    def run_opcode(self, opcode, payload = None, on_chunk = None):
+        self.ensure()
+        try:
+            data = self.fitbit.run_opcode(opcode, payload, on_chunk)
+        except:
+            self._failed()
+            raise
+        self.last_used = time.time()
+        return data
+
+    def resume_data_bank(self, data, on_chunk = None):
+        """Continues a data bank transfer that failed part way, if the
+        link it was running on is still alive. Returns None if it
+        isn't and the dump has to start over.
+
+        """
+        if not self.is_alive():
+            return None
+        with self.fitbit.lock:
+            try:
+                data = self.fitbit.get_data_bank(data, 0x60, on_chunk)
+            except:
+                self._failed()
+                raise
+        self.last_used = time.time()
+        return data
+
+    def prefetch_opcode(self, opcode):
+        self.ensure()
+        try:
+            self.fitbit.prefetch_opcode(opcode)
+        except:
+            # Nothing resumes a prefetch
+            self.invalidate()
+            raise
+        self.last_used = time.time()
+
+    def invalidate(self):
+        self.last_used = None
+        self.suspect = False
+
+    def close(self):
+        """Tells the tracker to go to sleep, ending the session."""
+        try:
+            if self.is_open():
+                self.fitbit.command_sleep()
+        finally:
+            self.invalidate()
 
 def main():
     #base = DynastreamANT(True)
@@ -372,7 +622,7 @@ def main():
     print ["%02x" % x for x in d[7:14]]
     j = 0
     for i in range(14, len(d), 3):
-        print d[i:i+3]
+        print list(d[i:i+3])
         j += 1
     print "Records: %d" % (j)
     device.parse_bank1_data(device.run_data_bank_opcode(0x01))
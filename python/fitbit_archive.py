@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit raw data bank archive
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import os, re, time, zlib, random, sqlite3, hashlib
+from fitbit_sync import write_durably
+
+def _gear_table():
+    # Fixed seed, chunk boundaries have to be the same on every run
+    r = random.Random(0x46697462)
+    return [r.getrandbits(32) for i in range(256)]
+
+GEAR = _gear_table()
+
+def split_chunks(data, min_size = 256, avg_bits = 10, max_size = 8192):
+    """Splits data into content defined chunks, with a gear rolling
+    hash. Boundaries depend on the bytes around them, not on their
+    offset, so data added to (or cut from) either end of a dump leaves
+    the chunks in the middle the same. Returns a list of (offset,
+    length).
+
+    """
+    data = bytearray(data)
+    mask = (1 << avg_bits) - 1
+    chunks = []
+    start = 0
+    end = len(data)
+    gear = GEAR
+    while start < end:
+        stop = min(start + max_size, end)
+        i = start + min_size
+        h = 0
+        cut = stop
+        # Warm the hash up on the bytes before the minimum size, so
+        # its state doesn't depend on where the chunk started
+        for j in xrange(max(start, i - 32), min(i, stop)):
+            h = ((h << 1) + gear[data[j]]) & 0xffffffff
+        while i < stop:
+            h = ((h << 1) + gear[data[i]]) & 0xffffffff
+            i += 1
+            if not h & mask:
+                cut = i
+                break
+        chunks.append((start, cut - start))
+        start = cut
+    return chunks
+
+class DumpArchive(object):
+    """Archive of raw data bank dumps, so they can be decoded again as
+    we figure out more of the formats.
+
+    Dumps are split into content defined chunks, stored zlib
+    compressed under their sha1 in objects/, so chunks shared by
+    consecutive dumps (which overlap until the bank is erased), or by
+    different trackers, are only stored once. An SQLite index maps
+    each dump (tracker serial, bank, time) to its chunks and their
+    offsets, for lookup and random access.
+
+    """
+
+    NAME = re.compile(r"^([0-9a-f]+)-([0-9a-f]{2})-(\d+)\.bin$")
+
+    def __init__(self, root):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        if not os.path.isdir(self.objects):
+            os.makedirs(self.objects)
+        self.db = sqlite3.connect(os.path.join(root, "index.db"), timeout = 30)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS dumps "
+                            "(id INTEGER PRIMARY KEY, serial TEXT NOT NULL, "
+                            "bank INTEGER NOT NULL, started INTEGER NOT NULL, "
+                            "size INTEGER NOT NULL, sha1 TEXT NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS dumps_by_time "
+                            "ON dumps (serial, bank, started)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS dump_chunks "
+                            "(dump INTEGER NOT NULL, offset INTEGER NOT NULL, "
+                            "length INTEGER NOT NULL, sha1 TEXT NOT NULL, "
+                            "PRIMARY KEY (dump, offset))")
+            self.db.execute("CREATE TABLE IF NOT EXISTS chunks "
+                            "(sha1 TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                            "stored INTEGER NOT NULL)")
+
+    def _chunk_path(self, sha1):
+        return os.path.join(self.objects, sha1[:2], sha1[2:])
+
+    def _put_chunk(self, chunk):
+        sha1 = hashlib.sha1(chunk).hexdigest()
+        if self.db.execute("SELECT 1 FROM chunks WHERE sha1 = ?", (sha1,)).fetchone():
+            return sha1
+        path = self._chunk_path(sha1)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        stored = zlib.compress(chunk, 9)
+        write_durably(path, stored)
+        self.db.execute("INSERT INTO chunks (sha1, size, stored) VALUES (?, ?, ?)",
+                        (sha1, len(chunk), len(stored)))
+        return sha1
+
+    def _get_chunk(self, sha1):
+        with open(self._chunk_path(sha1), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def add(self, serial, bank, data, started = None):
+        """Archives a dump. Same argument order as the exporters'
+        export_bank, so it can be a BankTransaction persist step.
+        Returns the dump id.
+
+        """
+        if started is None:
+            started = int(time.time())
+        data = str(data)
+        with self.db:
+            cur = self.db.execute("INSERT INTO dumps (serial, bank, started, size, sha1) "
+                                  "VALUES (?, ?, ?, ?, ?)",
+                                  (serial, bank, started, len(data),
+                                   hashlib.sha1(data).hexdigest()))
+            dump = cur.lastrowid
+            rows = []
+            for (offset, length) in split_chunks(data):
+                sha1 = self._put_chunk(data[offset:offset+length])
+                rows.append((dump, offset, length, sha1))
+            self.db.executemany("INSERT INTO dump_chunks (dump, offset, length, sha1) "
+                                "VALUES (?, ?, ?, ?)", rows)
+        return dump
+
+    def add_directory(self, path):
+        """Archives every <serial>-<bank>-<time>.bin dump in a
+        directory (as stored by fitbit_sync.BankTransaction) that isn't
+        archived yet. Returns the number of dumps added.
+
+        """
+        count = 0
+        for name in sorted(os.listdir(path)):
+            m = self.NAME.match(name)
+            if m is None:
+                continue
+            (serial, bank, started) = (m.group(1), int(m.group(2), 16), int(m.group(3)))
+            if self.find(serial, bank, started, started + 1):
+                continue
+            with open(os.path.join(path, name), "rb") as f:
+                self.add(serial, bank, f.read(), started)
+            count += 1
+        return count
+
+    def find(self, serial = None, bank = None, start = None, end = None):
+        """Returns (id, serial, bank, started, size) for the dumps
+        matching a tracker, bank and [start, end) time range, oldest
+        first. Anything left as None matches everything.
+
+        """
+        where = []
+        args = []
+        for (cond, value) in (("serial = ?", serial), ("bank = ?", bank),
+                              ("started >= ?", start), ("started < ?", end)):
+            if value is not None:
+                where.append(cond)
+                args.append(value)
+        sql = "SELECT id, serial, bank, started, size FROM dumps"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self.db.execute(sql + " ORDER BY started, id", args).fetchall()
+
+    def latest(self, serial, bank, before = None):
+        """Returns the id of the newest dump of a bank taken before a
+        time (or at all), or None.
+
+        """
+        sql = "SELECT id FROM dumps WHERE serial = ? AND bank = ?"
+        args = [serial, bank]
+        if before is not None:
+            sql += " AND started < ?"
+            args.append(before)
+        row = self.db.execute(sql + " ORDER BY started DESC, id DESC LIMIT 1", args).fetchone()
+        return row[0] if row else None
+
+    def get(self, dump):
+        """Returns the whole dump"""
+        return self.read(dump)
+
+    def read(self, dump, offset = 0, length = None):
+        """Returns length bytes (or everything) of a dump starting at
+        offset, only decompressing the chunks that cover them.
+
+        """
+        row = self.db.execute("SELECT size FROM dumps WHERE id = ?", (dump,)).fetchone()
+        if row is None:
+            raise KeyError("No dump %d in archive" % (dump))
+        end = row[0] if length is None else min(row[0], offset + length)
+        if end <= offset:
+            return ""
+        rows = self.db.execute("SELECT offset, length, sha1 FROM dump_chunks "
+                               "WHERE dump = ? AND offset < ? AND offset + length > ? "
+                               "ORDER BY offset", (dump, end, offset)).fetchall()
+        data = "".join([self._get_chunk(sha1) for (o, l, sha1) in rows])
+        first = rows[0][0] if rows else offset
+        return data[offset - first:end - first]
+
+    def stats(self):
+        """Returns (dumps, total dump bytes, unique chunk bytes, stored
+        bytes)
+
+        """
+        (dumps, total) = self.db.execute("SELECT COUNT(*), TOTAL(size) FROM dumps").fetchone()
+        (unique, stored) = self.db.execute("SELECT TOTAL(size), TOTAL(stored) FROM chunks").fetchone()
+        return (dumps, int(total), int(unique), int(stored))
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit beacon scanner
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import sys, time, threading, traceback, contextlib
+
+class TrackerPresence(object):
+    """Cache of when tracker beacons were last seen. Trackers are
+    keyed by their ANT device number, or None if a beacon was seen
+    before we could find out which tracker sent it.
+
+    """
+
+    def __init__(self, max_age = 30):
+        #: seconds a beacon counts as the tracker being in range
+        self.max_age = max_age
+        self._seen = {}
+        self._last_any = None
+        self._cond = threading.Condition()
+
+    def saw(self, tracker_id = None, when = None):
+        if when is None:
+            when = time.time()
+        with self._cond:
+            self._seen[tracker_id] = when
+            self._last_any = when
+            self._cond.notify_all()
+
+    def forget(self, tracker_id = None):
+        with self._cond:
+            self._seen.pop(tracker_id, None)
+
+    def last_seen(self, tracker_id = None):
+        """Returns when the tracker (or any tracker, if tracker_id is
+        None) was last seen, or None if it never was.
+
+        """
+        with self._cond:
+            if tracker_id is None:
+                return self._last_any
+            return self._seen.get(tracker_id)
+
+    def is_present(self, tracker_id = None, max_age = None):
+        if max_age is None:
+            max_age = self.max_age
+        seen = self.last_seen(tracker_id)
+        return seen is not None and time.time() - seen <= max_age
+
+    def present(self, max_age = None):
+        """Returns the ids of all trackers seen in the last max_age
+        seconds.
+
+        """
+        if max_age is None:
+            max_age = self.max_age
+        now = time.time()
+        with self._cond:
+            return [t for (t, seen) in self._seen.items()
+                    if now - seen <= max_age]
+
+    def wait_for(self, tracker_id = None, timeout = None):
+        """Blocks until the tracker is present, or timeout seconds
+        pass. Returns True if the tracker is present.
+
+        """
+        end = None
+        if timeout is not None:
+            end = time.time() + timeout
+        with self._cond:
+            while not self.is_present(tracker_id):
+                if end is None:
+                    self._cond.wait(1)
+                    continue
+                remaining = end - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+class BeaconScanner(object):
+    """Keeps the fitbit search channel open on a base while it isn't
+    syncing, and records every tracker beacon (0x4E) into a
+    TrackerPresence cache.
+
+    The base can only do one thing at a time, so syncs need to run
+    inside paused().
+
+    If scanning fails (say the base went away), the error is logged
+    and scanning is retried, backing off up to max_backoff seconds.
+
+    Scanning resets the base, which ends any tracker session on it. If
+    given a TrackerSession, the scanner leaves the base alone while the
+    session is open and not yet idle for its max_idle seconds, so the
+    next sync can still reuse it, and then ends the session.
+
+    """
+
+    def __init__(self, fitbit, presence = None, on_beacon = None,
+                 on_arrival = None, max_backoff = 60, session = None):
+        self.fitbit = fitbit
+        self.session = session
+        self.presence = presence if presence is not None else TrackerPresence()
+        #: optional callable, called with the tracker id on every beacon
+        self.on_beacon = on_beacon
+        #: optional callable, called with the tracker id on a beacon
+        #: when no tracker was present before it
+        self.on_arrival = on_arrival
+        self.max_backoff = max_backoff
+        #: consecutive times scanning failed
+        self.failures = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._stopped = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._stopped = False
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops scanning, and waits for the scan thread to let go of
+        the base. A paused() block running at the time doesn't start
+        scanning again.
+
+        """
+        self._stopped = True
+        self._halt()
+
+    def _halt(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @contextlib.contextmanager
+    def paused(self):
+        was_running = self.running
+        self._halt()
+        try:
+            yield
+        finally:
+            if was_running and not self._stopped:
+                self.start()
+
+    def is_present(self, tracker_id = None):
+        """Presence check for the scheduler. If we aren't scanning, we
+        can't know, so trackers count as present. While scanning is
+        failing, nothing new gets seen, so trackers drop out as their
+        beacons age.
+
+        """
+        if not self.running:
+            return True
+        return self.presence.is_present(tracker_id)
+
+    def _beacon(self, tracker_id):
+        arrived = not self.presence.is_present()
+        self.presence.saw(tracker_id)
+        if self.on_beacon is not None:
+            self.on_beacon(tracker_id)
+        if arrived and self.on_arrival is not None:
+            self.on_arrival(tracker_id)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._scan()
+            except Exception, e:
+                self.failures += 1
+                delay = min(self.max_backoff, 2 ** (self.failures - 1))
+                print "Beacon scanner failed with", e
+                print
+                print '-'*60
+                traceback.print_exc(file=sys.stdout)
+                print '-'*60
+                print "Beacon scanner: retrying in %d seconds" % (delay,)
+                self._stop.wait(delay)
+
+    def _scan(self):
+        base = self.fitbit.base
+        if not base.is_open():
+            raise Exception("Base is not open")
+        if self.session is not None:
+            while self.session.is_open():
+                idle = time.time() - self.session.last_used
+                if idle > self.session.max_idle:
+                    break
+                if self._stop.wait(self.session.max_idle - idle):
+                    return
+            self.session.close()
+        self.fitbit.init_fitbit()
+        self.failures = 0
+        tracker_id = None
+        requested = False
+        while not self._stop.is_set():
+            if not base.is_open():
+                raise Exception("Base was closed")
+            d = base._receive_message()
+            if len(d) < 4:
+                continue
+            if d[2] == 0x4E:
+                # The search channel is a wildcard, so ask the base who
+                # it locked on to the first time we hear from a tracker.
+                if tracker_id is None and not requested:
+                    base.request_message(0x51)
+                    requested = True
+                self._beacon(tracker_id)
+            elif d[2] == 0x51 and len(d) > 6:
+                tracker_id = d[4] | d[5] << 8
+                self._beacon(tracker_id)
+            elif d[2] == 0x40 and len(d) > 5 and d[4] == 0x01:
+                if d[5] == 0x08:
+                    # EVENT_RX_FAIL_GO_TO_SEARCH, lost the tracker
+                    tracker_id = None
+                    requested = False
+                elif d[5] in (0x01, 0x07):
+                    # Search timed out and the channel closed, start
+                    # searching again
+                    tracker_id = None
+                    requested = False
+                    self.fitbit.init_fitbit()
+        # The channel is left open, whoever uses the base next starts
+        # with a base reset anyways.
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit sync round trip benchmark
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import os, sys, time, random, argparse, contextlib, shutil, tempfile
+from fitbit import FitBit, pack_payload_burst
+from fitbit_client import FitBitClient
+from fitbit_server import UploadServer, default_chain
+from fitbit_sim import SimulatedBase, minute_bank
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+@contextlib.contextmanager
+def quiet():
+    # The client and tracker code are chatty, keep them out of the
+    # results
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+class RoundTripBenchmark(object):
+    """Runs full upload request chains between a FitBitClient, a
+    simulated tracker and a local stand-in upload server, and times
+    them.
+
+    """
+
+    def __init__(self, banks, chain, latency = 0, message_delay = 0,
+                 keep_session = True, loss = 0):
+        self.banks = banks
+        self.keep_session = keep_session
+        self.server = UploadServer(chain, latency)
+        lose = None
+        if loss:
+            # Each data bank chunk's burst is lost with probability loss
+            lose = lambda bank_id: random.random() < loss
+        self.base = SimulatedBase(banks, message_delay = message_delay, lose = lose)
+        # Dumps get stored (and fsynced) and archived as in a real sync
+        self.dump_dir = tempfile.mkdtemp(prefix = "fitbit_bench")
+        self.client = FitBitClient(self.base, self.dump_dir,
+                                   os.path.join(self.dump_dir, "archive"))
+        self.client.FITBIT_HOST = self.server.url
+
+    def run_once(self):
+        # The chain erases the banks, put the data back
+        self.base.banks = dict([(b, bytearray(d)) for (b, d) in self.banks.items()])
+        # Without keep_session the client closes the base when it's done
+        if not self.base.is_open():
+            self.base.open()
+        self.server.reset()
+        started = time.time()
+        self.client.run_upload_request(self.keep_session)
+        elapsed = time.time() - started
+        return (elapsed, self.check())
+
+    def check(self):
+        """Returns True if the server got back exactly the bank data
+        on the simulated tracker.
+
+        """
+        for r in self.server.requests:
+            if r.path.endswith("/dumpData/dumpData"):
+                return r.op_responses() == [self.banks.get(b, bytearray()) for b in sorted(self.banks)]
+        return False
+
+    def run(self, runs):
+        self.server.start()
+        times = []
+        failed = 0
+        try:
+            with quiet():
+                for n in range(runs):
+                    try:
+                        (elapsed, ok) = self.run_once()
+                    except Exception, e:
+                        failed += 1
+                        continue
+                    times.append(elapsed)
+                    failed += not ok
+        finally:
+            self.server.stop()
+            shutil.rmtree(self.dump_dir, True)
+        return (times, failed)
+
+class PayloadBenchmark(object):
+    """Times writing payloads (alarms, settings) to a simulated
+    tracker, both just laying out the burst and the whole opcode.
+
+    """
+
+    OPCODE = [0x23, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
+
+    def __init__(self, size):
+        self.payload = bytearray([random.getrandbits(8) for i in range(size)])
+        self.base = SimulatedBase()
+        self.fitbit = FitBit(self.base)
+        with quiet():
+            self.fitbit.init_tracker_for_transfer()
+
+    def pack(self, runs):
+        """Seconds per payload spent packing its burst"""
+        started = time.time()
+        for n in range(runs):
+            pack_payload_burst(n & 0xff, self.payload)
+        return (time.time() - started) / runs
+
+    def write(self, runs):
+        """Seconds per payload written, and whether the tracker got
+        every one intact
+
+        """
+        del self.base.payloads[:]
+        started = time.time()
+        with quiet():
+            for n in range(runs):
+                self.fitbit.run_opcode(self.OPCODE, self.payload)
+        elapsed = (time.time() - started) / runs
+        ok = [data for (opcode, data) in self.base.payloads] == [self.payload] * runs
+        return (elapsed, ok)
+
+def payload_main(args):
+    bench = PayloadBenchmark(args.payload)
+    packing = bench.pack(max(args.runs, 10000))
+    (writing, ok) = bench.write(args.runs)
+    print "%d byte payloads" % (args.payload,)
+    print "packing %.1fus (%.0f KB/s)  whole write %.1fms" % \
+        (packing * 1e6, args.payload / packing / 1024, writing * 1e3)
+    if not ok:
+        print "The tracker got the wrong payload"
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description = "Time fitbit upload request chains against a simulated tracker and a local upload server")
+    parser.add_argument("-n", "--runs", type = int, default = 20,
+                        help = "request chains (or payloads) to run")
+    parser.add_argument("-H", "--hours", type = int, default = 24,
+                        help = "hours of minute data on the tracker")
+    parser.add_argument("-d", "--dumps", type = int, default = 1,
+                        help = "times the chain dumps the banks")
+    parser.add_argument("-l", "--latency", type = float, default = 0,
+                        help = "seconds the server takes to answer each request")
+    parser.add_argument("-m", "--message-delay", type = float, default = 0,
+                        help = "seconds each message from the tracker takes")
+    parser.add_argument("-p", "--loss", type = float, default = 0,
+                        help = "probability of a data bank chunk getting lost")
+    parser.add_argument("--new-session", action = "store_true",
+                        help = "reinitialize the tracker link for every chain")
+    parser.add_argument("--payload", type = int, metavar = "SIZE",
+                        help = "time writing SIZE byte payloads instead of request chains")
+    args = parser.parse_args()
+    if args.payload is not None:
+        return payload_main(args)
+
+    banks = {0 : minute_bank(int(time.time()) - args.hours * 3600, args.hours),
+             1 : bytearray(14 * args.hours)}
+    chain = default_chain(sorted(banks), args.dumps)
+    bench = RoundTripBenchmark(banks, chain, args.latency, args.message_delay,
+                               not args.new_session, args.loss)
+    (times, failed) = bench.run(args.runs)
+    if not times:
+        print "All %d chains failed" % (args.runs,)
+        return 1
+    size = sum([len(d) for d in banks.values()]) * args.dumps
+    print "%d chains of %d requests, %d bytes dumped each" % (len(times), len(chain), size)
+    print "first %.3fs  median %.3fs  p95 %.3fs  max %.3fs" % \
+        (times[0], percentile(times, 0.5), percentile(times, 0.95), max(times))
+    print "%.1f chains/s, %.1f KB/s from the tracker" % \
+        (len(times) / sum(times), size * len(times) / sum(times) / 1024)
+    if failed:
+        print "%d chains failed or returned the wrong data" % (failed,)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
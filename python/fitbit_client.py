@@ -44,14 +44,23 @@
 # EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #################################################################
 
+import os
 import sys
+import time
+import threading
 import urllib
 import urllib2
 import urlparse
 import base64
 import xml.etree.ElementTree as et
-from fitbit import FitBit
+from fitbit import FitBit, TrackerSession
+from fitbit_scheduler import SyncScheduler
+from fitbit_beacon import BeaconScanner, TrackerPresence
+from fitbit_prefetch import OpcodePrefetcher
+from fitbit_sync import BankTransaction
+from fitbit_archive import DumpArchive
 from antprotocol.bases import FitBitANT, DynastreamANT
+from antprotocol.hotplug import DeviceManager
 
 class FitBitResponse(object):
     def __init__(self, response):
@@ -71,10 +80,10 @@ class FitBitResponse(object):
 
         for opcode in self.root.findall("device/remoteOps/remoteOp"):
             op = {}
-            op["opcode"] = [ord(x) for x in base64.b64decode(opcode.find("opCode").text)]
+            op["opcode"] = bytearray(base64.b64decode(opcode.find("opCode").text))
             op["payload"] = None
             if opcode.find("payloadData").text is not None:
-                op["payload"] = [x for x in base64.b64decode(opcode.find("payloadData").text)]
+                op["payload"] = bytearray(base64.b64decode(opcode.find("payloadData").text))
             self.opcodes.append(op)
     
     def __repr__(self):
@@ -87,18 +96,43 @@ class FitBitClient(object):
     START_PATH = "/device/tracker/uploadData"
     DEBUG = True
     BASES = [FitBitANT, DynastreamANT]
+    # Opcodes to run while waiting on the first request. Later
+    # requests prefetch whatever the website asked for last time.
+    PREFETCH_OPCODES = {START_PATH : [bytearray([0x24, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])]}
+    # Where data bank dumps are stored before the website may erase them
+    DUMP_DIR = os.path.expanduser("~/.fitbit/dumps")
+    # Where every dump is archived, for decoding again later
+    ARCHIVE_DIR = os.path.expanduser("~/.fitbit/archive")
 
-    def __init__(self):
+    def __init__(self, base = None, dump_dir = None, archive_dir = None):
         self.info_dict = {}
-        self.fitbit = None
+        self.dump_dir = dump_dir or self.DUMP_DIR
+        self.archive_dir = archive_dir or self.ARCHIVE_DIR
+        self.expected_opcodes = dict(self.PREFETCH_OPCODES)
+        self.remote_info = None
+        #: optional callable, called with every opcode run for the
+        #: website and its result
+        self.on_opcode_result = None
+        if base is None:
+            base = self.find_base()
+        self.attach(base)
+
+    def attach(self, base):
+        """Starts using a (newly plugged in) base. Anything we had
+        going with the old one is dropped.
+
+        """
+        self.fitbit = FitBit(base)
+        self.session = TrackerSession(self.fitbit)
+        self.prefetcher = OpcodePrefetcher(self.session)
+
+    def find_base(self):
         for base in [bc(debug=self.DEBUG) for bc in self.BASES]:
             for retries in (2,1,0):
                 try:
                     if base.open():
                         print "Found %s base" % (base.NAME,)
-                        self.fitbit = FitBit(base)
-                        self.remote_info = None
-                        break
+                        return base
                     else:
                         break
                 except Exception, e:
@@ -108,11 +142,7 @@ class FitBitClient(object):
                         time.sleep(5)
             else:
                 raise
-            if self.fitbit:
-                break
-        if not self.fitbit:
-            print "No devices connected!"
-            exit(1)
+        raise Exception("No devices connected!")
 
     def form_base_info(self):
         self.info_dict.clear()
@@ -124,25 +154,49 @@ class FitBitClient(object):
         if self.remote_info:
             self.info_dict = dict(self.info_dict, **self.remote_info)
 
-    def run_upload_request(self):
+    def run_upload_request(self, keep_session = False):
+        """Runs a full sync with the website. With keep_session, the
+        tracker link and base are left open so the next request can
+        reuse them instead of reinitializing.
+
+        """
+        if not self.fitbit.base.is_open():
+            # Reopening is up to whoever owns the base (find_base, or
+            # a DeviceManager), only they know which device it was
+            raise Exception("Base is not open")
         try:
-            self.fitbit.init_tracker_for_transfer()
+            self.session.ensure()
 
             url = self.FITBIT_HOST + self.START_PATH
 
+            # Banks dumped and stored this sync, by bank
+            stored = {}
+
             # Start the request Chain
             self.form_base_info()
             while url is not None:
                 req = urllib2.Request(url, urllib.urlencode(self.info_dict))
                 req.add_header("User-Agent", "FitBit Client")
-                res = urllib2.urlopen(req).read()
+                # Keep the tracker busy while the website thinks
+                path = urlparse.urlparse(url).path
+                self.prefetcher.start(self.expected_opcodes.get(path, []))
+                try:
+                    res = urllib2.urlopen(req).read()
+                finally:
+                    self.prefetcher.stop()
                 print res
                 r = FitBitResponse(res)
+                self.expected_opcodes[path] = [o["opcode"] for o in r.opcodes
+                                               if o["payload"] is None and
+                                               o["opcode"][0] in FitBit.CACHEABLE_OPCODES]
                 self.remote_info = r.response
                 self.form_base_info()
                 op_index = 0
                 for o in r.opcodes:
-                    self.info_dict["opResponse[%d]" % op_index] = base64.b64encode(''.join([chr(x) for x in self.fitbit.run_opcode(o["opcode"], o["payload"])]))
+                    result = self.run_remote_opcode(o["opcode"], o["payload"], stored)
+                    if self.on_opcode_result is not None:
+                        self.on_opcode_result(o["opcode"], result)
+                    self.info_dict["opResponse[%d]" % op_index] = base64.b64encode(result)
                     self.info_dict["opStatus[%d]" % op_index] = "success"
                     op_index += 1
                 urllib.urlencode(self.info_dict)
@@ -154,34 +208,140 @@ class FitBitClient(object):
                     print "No URL returned. Quitting."
                     break
         except:
-            self.fitbit.base.close()
+            self.session.invalidate()
+            if not keep_session:
+                self.fitbit.base.close()
             raise
-        self.fitbit.command_sleep()
+        finally:
+            self.fitbit.opcode_cache.clear()
+        if keep_session:
+            return
+        self.session.close()
         self.fitbit.base.close()
 
-def main():
-    f = FitBitClient()
-    f.run_upload_request()    
+    def run_remote_opcode(self, opcode, payload, stored):
+        """Runs an opcode the website asked for. Data bank dumps are
+        stored durably before the website gets them, and an erase is
+        refused unless that bank's dump was stored earlier in the same
+        sync.
+
+        """
+        if opcode[0] == 0x22 and payload is None:
+            transaction = BankTransaction(self.session, opcode[1], self.dump_dir)
+            data = transaction.save()
+            stored[opcode[1]] = transaction
+            self.archive_dump(transaction, data)
+            return data
+        if opcode[0] == 0x25:
+            transaction = stored.pop(opcode[1], None)
+            if transaction is None:
+                raise Exception("Refusing to erase bank %d, its dump isn't stored" % (opcode[1]))
+            return transaction.erase(opcode[2] << 24 | opcode[3] << 16 |
+                                     opcode[4] << 8 | opcode[5])
+        return self.session.run_opcode(opcode, payload)
+
+    def archive_dump(self, transaction, data):
+        """Adds a stored dump to the archive. Failing to doesn't stop
+        the sync, the dump is still in dump_dir for
+        DumpArchive.add_directory to pick up.
+
+        """
+        try:
+            # Opened here, SQLite connections stay in the thread that
+            # made them and syncs can run from any
+            archive = DumpArchive(self.archive_dir)
+            try:
+                archive.add(transaction.serial, transaction.bank, data,
+                            transaction.started)
+            finally:
+                archive.close()
+        except Exception, e:
+            print "Failed to archive bank %d: %s" % (transaction.bank, e)
+
+def main(client = None, keep_session = False):
+    f = client or FitBitClient()
+    f.run_upload_request(keep_session)
     return 0
 
+class SyncDaemon(object):
+    """Syncs the tracker every interval seconds through whichever base
+    is plugged in. Bases come from a DeviceManager: when ours is
+    unplugged, scanning and syncing stop until another one shows up.
+
+    In between syncs the base listens for beacons, so a sync starts as
+    soon as the tracker shows up and is skipped while it's out of
+    range. The link to the tracker is kept after a sync, and the
+    scanner holds off until it's gone idle, so syncs close together
+    (retries, a tracker coming back into range) skip the tracker
+    reinit.
+
+    """
+
+    def __init__(self, interval = 15 * 60):
+        self.interval = interval
+        self.client = None
+        self.scanner = None
+        #: (bus, address) of the base we're using
+        self.base_key = None
+        self.presence = TrackerPresence()
+        self.scheduler = SyncScheduler()
+        self.devices = DeviceManager(FitBitClient.BASES, self.attach,
+                                     self.detach, debug = FitBitClient.DEBUG)
+        self._lock = threading.Lock()
+
+    def attach(self, key, base):
+        with self._lock:
+            if self.base_key is not None:
+                # Already have one, this one is spare
+                return
+            self.base_key = key
+            if self.client is None:
+                self.client = FitBitClient(base)
+            else:
+                self.client.attach(base)
+            scanner = BeaconScanner(self.client.fitbit, self.presence,
+                                    session = self.client.session)
+            # Sync as soon as a tracker comes into range, but not on
+            # every beacon while it stays there
+            scanner.on_arrival = lambda tracker_id: self.scheduler.trigger("tracker")
+            self.scanner = scanner
+            self.scheduler.add_job("tracker", lambda: self.sync(scanner),
+                                   interval = self.interval,
+                                   is_present = scanner.is_present)
+            scanner.start()
+
+    def detach(self, key, base):
+        with self._lock:
+            if key != self.base_key:
+                return
+            self.scheduler.remove_job("tracker")
+            self.scanner.stop()
+            self.scanner = None
+            self.client.session.invalidate()
+            self.base_key = None
+        # Carry on with a spare, if there is one
+        for (key, base) in self.devices.bases.items():
+            self.attach(key, base)
+            break
+
+    def sync(self, scanner):
+        with scanner.paused():
+            main(self.client, keep_session = True)
+            # The tracker just answered us, so it's still in range. A
+            # beacon right after the sync isn't an arrival.
+            scanner.presence.saw()
+
+    def run(self):
+        self.devices.start()
+        if self.base_key is None:
+            print "Waiting for a base..."
+        self.scheduler.run_forever()
+
 if __name__ == '__main__':
-    import time
-    import traceback
-    
     cycle_minutes = 15
-    
-    while True:
-        try:
-            main()
-        except Exception, e:
-            print "Failed with", e
-            print
-            print '-'*60
-            traceback.print_exc(file=sys.stdout)
-            print '-'*60
-        else:
-            print "normal finish"
-            print "restarting..."
-    
-    #sys.exit(main())
 
+    # Sync every cycle_minutes, backing off while the base or tracker
+    # can't be found instead of spinning on init/reset.
+    SyncDaemon(cycle_minutes * 60).run()
+
+    #sys.exit(main())
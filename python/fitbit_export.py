@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit record exporters
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import os, csv, sqlite3, itertools
+from fitbit_records import MinuteRecord, DailyRecord, SecondRecord, FloorRecord, decode_bank
+from fitbit_rollup import day_start
+
+#: Table name and record type for each bank we can export
+BANK_TABLES = {0x00 : ("minutes", MinuteRecord),
+               0x01 : ("days", DailyRecord),
+               0x02 : ("seconds", SecondRecord),
+               0x06 : ("floors", FloorRecord)}
+
+def batches(records, size):
+    """Splits an iterator into lists of at most size records, so we
+    never hold more than one batch in memory.
+
+    """
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+def days_touched(records):
+    """Start of every local day the records fall in"""
+    days = set()
+    (start, end) = (None, None)
+    for r in records:
+        # Records come in time order, so only look the day up when we
+        # leave the last one
+        if start is None or not start <= r.timestamp < end:
+            start = day_start(r.timestamp)
+            end = day_start(start + 25 * 3600)
+            days.add(start)
+    return days
+
+class SQLiteExporter(object):
+    """Writes decoded bank records into a SQLite database, one table
+    per bank, keyed on tracker serial and timestamp. Records that are
+    already there (from an earlier dump) get replaced.
+
+    Every write also bumps the generation of the (serial, day)s it
+    touched in the changes table, so readers caching per day results
+    (fitbit_query) know what to throw away. There's one row per
+    (serial, day), so the table only grows with the days recorded.
+
+    """
+
+    def __init__(self, path, batch_size = 5000, timeout = 30):
+        self.path = path
+        self.batch_size = batch_size
+        # timeout is how long to wait on other writers (say, pipeline
+        # workers) holding the database lock
+        self.db = sqlite3.connect(path, timeout = timeout)
+        self.create_tables()
+
+    def create_tables(self):
+        with self.db:
+            for (table, record) in BANK_TABLES.values():
+                self.db.execute("CREATE TABLE IF NOT EXISTS %s "
+                                "(serial TEXT NOT NULL, %s, "
+                                "PRIMARY KEY (serial, timestamp))" %
+                                (table, ", ".join(record._fields)))
+            self.db.execute("CREATE TABLE IF NOT EXISTS changes "
+                            "(serial TEXT NOT NULL, day INTEGER NOT NULL, "
+                            "generation INTEGER NOT NULL, "
+                            "PRIMARY KEY (serial, day))")
+            self.db.execute("CREATE INDEX IF NOT EXISTS changes_by_generation "
+                            "ON changes (generation)")
+
+    def export(self, serial, bank, records):
+        """Writes records for the tracker with the given serial (as
+        made by fitbit_records.serial_string). Returns the number of
+        records written.
+
+        """
+        (table, record) = BANK_TABLES[bank]
+        sql = "INSERT OR REPLACE INTO %s (serial, %s) VALUES (?, %s)" % \
+              (table, ", ".join(record._fields),
+               ", ".join(["?"] * len(record._fields)))
+        count = 0
+        for batch in batches(records, self.batch_size):
+            # One transaction per batch, committed on the way out
+            with self.db:
+                self.db.executemany(sql, [(serial,) + tuple(r) for r in batch])
+                # We hold the write lock from here on, so no other
+                # writer can take the same generation
+                (generation,) = self.db.execute("SELECT IFNULL(MAX(generation), 0) + 1 "
+                                                "FROM changes").fetchone()
+                self.db.executemany("INSERT OR REPLACE INTO changes (serial, day, generation) "
+                                    "VALUES (?, ?, ?)",
+                                    [(serial, day, generation)
+                                     for day in sorted(days_touched(batch))])
+            count += len(batch)
+        return count
+
+    def export_bank(self, serial, bank, data):
+        return self.export(serial, bank, decode_bank(bank, data))
+
+    def close(self):
+        self.db.close()
+
+class CSVExporter(object):
+    """Appends decoded bank records to one CSV file per bank in a
+    directory, writing a header when a file is created.
+
+    """
+
+    def __init__(self, directory, batch_size = 5000):
+        self.directory = directory
+        self.batch_size = batch_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def export(self, serial, bank, records):
+        (table, record) = BANK_TABLES[bank]
+        path = os.path.join(self.directory, "%s.csv" % (table))
+        new = not os.path.exists(path)
+        count = 0
+        with open(path, "ab") as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(("serial",) + record._fields)
+            for batch in batches(records, self.batch_size):
+                writer.writerows([(serial,) + tuple(r) for r in batch])
+                count += len(batch)
+        return count
+
+    def export_bank(self, serial, bank, data):
+        return self.export(serial, bank, decode_bank(bank, data))
+
+    def close(self):
+        pass
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit multiprocess sync pipeline
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import sys, time, array, struct, ctypes, threading, multiprocessing
+import usb.core
+from antprotocol.protocol import ANT
+from fitbit_records import serial_string, BANKS
+
+class FrameRing(object):
+    """Ring buffer of variable length frames in shared memory, for
+    handing data between processes without pickling it through a
+    pipe. Any number of processes can put and get.
+
+    """
+
+    LENGTH = struct.Struct("<I")
+
+    def __init__(self, size = 4 * 1024 * 1024):
+        self.size = size
+        self._buf = multiprocessing.RawArray(ctypes.c_char, size)
+        #: total bytes ever written and read, positions are these
+        #: modulo size
+        self._head = multiprocessing.RawValue(ctypes.c_ulonglong, 0)
+        self._tail = multiprocessing.RawValue(ctypes.c_ulonglong, 0)
+        self._cond = multiprocessing.Condition()
+
+    def _copy_in(self, pos, data):
+        i = pos % self.size
+        first = min(len(data), self.size - i)
+        self._buf[i:i+first] = data[:first]
+        if first < len(data):
+            self._buf[0:len(data)-first] = data[first:]
+
+    def _copy_out(self, pos, length):
+        i = pos % self.size
+        first = min(length, self.size - i)
+        data = self._buf[i:i+first]
+        if first < length:
+            data += self._buf[0:length-first]
+        return data
+
+    def _wait(self, ready, timeout):
+        # Condition.wait doesn't tell us if it timed out, so keep time
+        # ourselves
+        end = None
+        if timeout is not None:
+            end = time.time() + timeout
+        while not ready():
+            if end is None:
+                self._cond.wait(1)
+                continue
+            remaining = end - time.time()
+            if remaining <= 0:
+                return False
+            self._cond.wait(remaining)
+        return True
+
+    def put(self, frame, timeout = None):
+        """Adds a frame, waiting for room if the ring is full. Returns
+        False if there still wasn't room after timeout seconds.
+
+        """
+        frame = str(frame)
+        need = self.LENGTH.size + len(frame)
+        if need > self.size:
+            raise ValueError("Frame of %d bytes doesn't fit in ring" % (len(frame)))
+        with self._cond:
+            if not self._wait(lambda: self.size - (self._head.value - self._tail.value) >= need,
+                              timeout):
+                return False
+            self._copy_in(self._head.value, self.LENGTH.pack(len(frame)) + frame)
+            self._head.value += need
+            self._cond.notify_all()
+        return True
+
+    def get(self, timeout = None):
+        """Takes the oldest frame, waiting for one if the ring is
+        empty. Returns None if there still wasn't one after timeout
+        seconds.
+
+        """
+        with self._cond:
+            if not self._wait(lambda: self._head.value != self._tail.value, timeout):
+                return None
+            tail = self._tail.value
+            (length,) = self.LENGTH.unpack(self._copy_out(tail, self.LENGTH.size))
+            frame = self._copy_out(tail + self.LENGTH.size, length)
+            self._tail.value = tail + self.LENGTH.size + length
+            self._cond.notify_all()
+        return frame
+
+#: Frame header: kind, bank, dump time, tracker serial
+FRAME = struct.Struct("<BBI5s")
+FRAME_STOP = 0
+FRAME_BANK = 1
+#: Seconds to wait for room in the ring when telling workers to stop
+STOP_TIMEOUT = 5
+
+def pack_bank_frame(serial, bank, started, data):
+    return FRAME.pack(FRAME_BANK, bank, started, str(bytearray(serial))) + str(data)
+
+def unpack_frame(frame):
+    (kind, bank, started, serial) = FRAME.unpack_from(frame)
+    return (kind, serial, bank, started, frame[FRAME.size:])
+
+#: usb_main state, as seen through a shared value
+USB_STARTING = 0
+USB_READY = 1
+USB_FAILED = 2
+
+def usb_main(base_classes, rx, tx, state, stop, debug = False):
+    """Owns the USB handle of the base. Reads constantly, splitting what
+    comes in into ANT messages and putting each one in the rx ring,
+    and writes whatever shows up in the tx ring. Nothing else runs
+    here, so bursts are read off the base as fast as they arrive no
+    matter how busy the protocol side is.
+
+    """
+    base = None
+    for base_class in base_classes:
+        candidate = base_class(debug = debug)
+        try:
+            if candidate.open():
+                base = candidate
+                break
+        except Exception, e:
+            print "Failed to open %s base: %s" % (candidate.NAME, e)
+    if base is None:
+        state.value = USB_FAILED
+        return
+    # Short reads, so we notice stop quickly
+    base.timeout = 100
+    state.value = USB_READY
+
+    def write():
+        while not stop.is_set():
+            command = tx.get(0.5)
+            if command is not None:
+                base._send(bytearray(command))
+
+    writer = threading.Thread(target = write)
+    writer.daemon = True
+    writer.start()
+    try:
+        while not stop.is_set():
+            message = base._receive_message()
+            if message:
+                rx.put(message)
+    finally:
+        stop.set()
+        writer.join()
+        base.close()
+
+class RingBase(ANT):
+    """ANT base whose USB end is in another process (usb_main), behind
+    a pair of FrameRings. Reads get whole ANT messages.
+
+    """
+
+    NAME = "Pipeline"
+
+    def __init__(self, rx, tx, state, debug = False):
+        super(RingBase, self).__init__(0x00, debug)
+        self.rx = rx
+        self.tx = tx
+        self.state = state
+        self.timeout = 1000
+        self._open = False
+
+    def open(self, timeout = 30):
+        """Waits for the USB process to open the base"""
+        end = time.time() + timeout
+        while self.state.value == USB_STARTING and time.time() < end:
+            time.sleep(0.1)
+        self._open = self.state.value == USB_READY
+        return self._open
+
+    def is_open(self):
+        return self._open and self.state.value == USB_READY
+
+    def close(self):
+        self._open = False
+
+    def _send(self, command):
+        # The USB process keeps reading while we aren't, so there may
+        # be broadcasts (beacons while we waited on the website) queued
+        # up. Nothing that came in before a command is a reply to it.
+        while self.rx.get(0) is not None:
+            pass
+        self._receiveBuffer = bytearray()
+        self.tx.put(command)
+
+    def _receive(self, size = 4096):
+        message = self.rx.get(self.timeout / 1000.0)
+        if message is None:
+            raise usb.core.USBError("Operation timed out")
+        return array.array('B', message)
+
+def sync_main(base, ring, workers, banks, upload):
+    """Does the tracker protocol and the website talking, through a
+    RingBase, and puts every data bank dump into the ring for the
+    workers. Doesn't decode anything itself.
+
+    """
+    from fitbit_client import FitBitClient
+    try:
+        if not base.open():
+            raise Exception("No devices connected!")
+        client = FitBitClient(base)
+        fitbit = client.fitbit
+
+        def push(opcode, data):
+            if opcode[0] == 0x24:
+                # The website asks for the tracker info first, that's
+                # where we get the serial to file the dumps under
+                fitbit.parse_info_packet(data)
+            elif opcode[0] == 0x22:
+                if fitbit.serial is None:
+                    print "Tracker serial unknown, not storing bank %d" % (opcode[1])
+                    return
+                ring.put(pack_bank_frame(fitbit.serial, opcode[1],
+                                         int(time.time()), data))
+
+        if upload:
+            client.on_opcode_result = push
+            client.run_upload_request()
+        else:
+            session = client.session
+            opcode = [0x24, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
+            push(opcode, session.run_opcode(opcode))
+            for bank in banks:
+                # Stored and archived like the dumps the website asks for
+                opcode = [0x22, bank, 0x00, 0x00, 0x00, 0x00, 0x00]
+                push(opcode, client.run_remote_opcode(opcode, None, {}))
+            session.close()
+            fitbit.base.close()
+    finally:
+        # If the workers are gone the ring may never have room, they
+        # also stop on their own once the ring is empty and we're done
+        for i in range(workers):
+            if not ring.put(FRAME.pack(FRAME_STOP, 0, 0, "\0" * 5), STOP_TIMEOUT):
+                print "Ring still full, not all workers were told to stop"
+                break
+
+def worker_main(ring, db_path, done):
+    """Decodes bank dumps from the ring and writes the records to a
+    SQLite database, until told to stop or done is set and the ring is
+    empty.
+
+    """
+    from fitbit_export import SQLiteExporter
+    exporter = SQLiteExporter(db_path)
+    try:
+        while True:
+            frame = ring.get(1)
+            if frame is None:
+                if done.is_set():
+                    return
+                continue
+            (kind, serial, bank, started, data) = unpack_frame(frame)
+            if kind == FRAME_STOP:
+                return
+            if bank not in BANKS:
+                continue
+            count = exporter.export_bank(serial_string(serial), bank, data)
+            print "Worker %d: bank %d, %d records" % \
+                  (multiprocessing.current_process().pid, bank, count)
+    finally:
+        exporter.close()
+
+class SyncPipeline(object):
+    """Splits a sync across processes:
+
+    - a USB process (usb_main) owns the base and only reads and writes
+      ANT messages, so a burst never gets missed because something
+      else had the GIL,
+    - a sync process (sync_main) runs the tracker protocol and the
+      website requests (XML, base64, prefetching) against a RingBase,
+      and hands raw bank dumps on,
+    - worker processes decode and store the dumps, on as many cores as
+      there are workers.
+
+    The processes talk through shared memory FrameRings.
+
+    """
+
+    def __init__(self, db_path, workers = None, banks = (0x00, 0x01, 0x02, 0x06),
+                 upload = True, ring_size = 4 * 1024 * 1024, base_classes = None):
+        self.db_path = db_path
+        self.workers = workers or multiprocessing.cpu_count()
+        self.banks = banks
+        self.upload = upload
+        if base_classes is None:
+            from antprotocol.bases import FitBitANT, DynastreamANT
+            base_classes = [FitBitANT, DynastreamANT]
+        self.base_classes = base_classes
+        self.ring = FrameRing(ring_size)
+        # ANT messages are tiny, these don't need to be big
+        self.rx = FrameRing(256 * 1024)
+        self.tx = FrameRing(64 * 1024)
+
+    def run(self):
+        # Set once the sync is over, stops the USB process and any
+        # worker that didn't get a stop frame
+        stop = multiprocessing.Event()
+        workers = [multiprocessing.Process(target = worker_main,
+                                           args = (self.ring, self.db_path, stop))
+                   for i in range(self.workers)]
+        for w in workers:
+            w.start()
+        state = multiprocessing.RawValue(ctypes.c_int, USB_STARTING)
+        io = multiprocessing.Process(target = usb_main,
+                                     args = (self.base_classes, self.rx, self.tx,
+                                             state, stop))
+        io.start()
+        base = RingBase(self.rx, self.tx, state)
+        sync = multiprocessing.Process(target = sync_main,
+                                       args = (base, self.ring, self.workers,
+                                               self.banks, self.upload))
+        sync.start()
+        sync.join()
+        stop.set()
+        io.join()
+        for w in workers:
+            w.join()
+        return sync.exitcode
+
+def main():
+    db_path = "fitbit.db"
+    if len(sys.argv) > 1:
+        db_path = sys.argv[1]
+    return SyncPipeline(db_path).run()
+
+if __name__ == '__main__':
+    sys.exit(main())
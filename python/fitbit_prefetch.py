@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit opcode prefetcher
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import threading
+
+class OpcodePrefetcher(object):
+    """Runs read only opcodes through a TrackerSession in the
+    background, while we're waiting on the website to tell us what to
+    run. Results end up in the FitBit opcode cache, and run_opcode
+    answers from there when the website asks for them.
+
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, opcodes):
+        self.stop()
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._prefetch,
+                                        args = (list(opcodes),))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops prefetching after the opcode currently running, and
+        waits for it to finish.
+
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _prefetch(self, opcodes):
+        for opcode in opcodes:
+            if self._stop.is_set():
+                return
+            try:
+                self.session.prefetch_opcode(opcode)
+            except Exception, e:
+                # Not fatal, the opcode just gets run for real later
+                print "Prefetch of opcode %s failed: %s" % (list(opcode), e)
+                return
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit activity query service
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import sys, time, json, sqlite3, argparse, threading, urlparse, collections
+import BaseHTTPServer
+from fitbit_export import SQLiteExporter
+from fitbit_rollup import day_start
+
+class DayCache(object):
+    """Bounded LRU cache of per day aggregates, keyed on
+    (serial, day start)
+
+    """
+
+    def __init__(self, size = 128):
+        self.size = size
+        self.days = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.days.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        # Move it to the recently used end
+        self.days[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.days.pop(key, None)
+        self.days[key] = value
+        while len(self.days) > self.size:
+            self.days.popitem(last = False)
+
+    def discard(self, key):
+        self.days.pop(key, None)
+
+    def clear(self):
+        self.days.clear()
+
+class ActivityQuery(object):
+    """Answers per tracker queries over a SQLiteExporter database.
+    Day summaries are cached; the changes table the exporter writes is
+    checked at most every check_interval seconds, and the days new
+    syncs touched are dropped from the cache. So a summary can be up
+    to check_interval seconds behind the database.
+
+    """
+
+    def __init__(self, path, cache_size = 128, check_interval = 1):
+        # Make sure the tables are there, even before the first sync
+        SQLiteExporter(path).close()
+        self.db = sqlite3.connect(path, check_same_thread = False)
+        self.cache = DayCache(cache_size)
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self._checked = 0
+        self.generation = self.db.execute("SELECT IFNULL(MAX(generation), 0) FROM changes").fetchone()[0]
+
+    def _check_changes(self):
+        now = time.time()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        for (generation, serial, day) in self.db.execute(
+                "SELECT generation, serial, day FROM changes "
+                "WHERE generation > ? ORDER BY generation", (self.generation,)):
+            self.cache.discard((serial, day))
+            self.generation = generation
+
+    def trackers(self):
+        with self.lock:
+            return [serial for (serial,) in self.db.execute(
+                "SELECT serial FROM minutes UNION SELECT serial FROM days "
+                "UNION SELECT serial FROM floors ORDER BY serial")]
+
+    def minutes(self, serial, start, end):
+        """[timestamp, steps, active score] for every minute in
+        [start, end)
+
+        """
+        with self.lock:
+            return [list(r) for r in self.db.execute(
+                "SELECT timestamp, steps, active_score FROM minutes "
+                "WHERE serial = ? AND timestamp >= ? AND timestamp < ? "
+                "ORDER BY timestamp", (serial, start, end))]
+
+    def floors(self, serial, start, end):
+        """[timestamp, floors] for every floor record in [start, end)"""
+        with self.lock:
+            return [list(r) for r in self.db.execute(
+                "SELECT timestamp, floors FROM floors "
+                "WHERE serial = ? AND timestamp >= ? AND timestamp < ? "
+                "ORDER BY timestamp", (serial, start, end))]
+
+    def day(self, serial, day):
+        """Summary of the local day starting at day"""
+        with self.lock:
+            self._check_changes()
+            summary = self.cache.get((serial, day))
+            if summary is None:
+                summary = self._summarize(serial, day)
+                self.cache.put((serial, day), summary)
+            return summary
+
+    def days(self, serial, start, end):
+        """Summaries of every local day overlapping [start, end)"""
+        summaries = []
+        t = day_start(start)
+        while t < end:
+            summaries.append(self.day(serial, t))
+            t = day_start(t + 25 * 3600)
+        return summaries
+
+    def _summarize(self, serial, day):
+        end = day_start(day + 25 * 3600)
+        hourly = [0] * ((end - day + 3599) // 3600)
+        (steps, active_score, minutes) = (0, 0, 0)
+        for (timestamp, s, a) in self.db.execute(
+                "SELECT timestamp, steps, active_score FROM minutes "
+                "WHERE serial = ? AND timestamp >= ? AND timestamp < ?",
+                (serial, day, end)):
+            hourly[(timestamp - day) // 3600] += s
+            steps += s
+            active_score += a
+            minutes += 1
+        floors = self.db.execute(
+            "SELECT IFNULL(SUM(floors), 0) FROM floors "
+            "WHERE serial = ? AND timestamp >= ? AND timestamp < ?",
+            (serial, day, end)).fetchone()[0]
+        # Daily total as the tracker reported it (bank 1), if we have it
+        reported = self.db.execute(
+            "SELECT steps FROM days "
+            "WHERE serial = ? AND timestamp >= ? AND timestamp < ? "
+            "ORDER BY timestamp DESC LIMIT 1", (serial, day, end)).fetchone()
+        return {"day" : day,
+                "steps" : steps,
+                "active_score" : active_score,
+                "minutes" : minutes,
+                "floors" : floors,
+                "reported_steps" : reported[0] if reported else None,
+                "hourly_steps" : hourly}
+
+    def stats(self):
+        with self.lock:
+            return {"cached_days" : len(self.cache.days),
+                    "hits" : self.cache.hits,
+                    "misses" : self.cache.misses,
+                    "generation" : self.generation}
+
+    def close(self):
+        self.db.close()
+
+class QueryHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """GET /trackers
+    GET /trackers/<serial>/minutes?start=<time>&end=<time>
+    GET /trackers/<serial>/days?start=<time>&end=<time>
+    GET /trackers/<serial>/floors?start=<time>&end=<time>
+    GET /stats
+
+    Times are seconds since the epoch. end defaults to now, start to
+    a day (a week for days) before end.
+
+    """
+
+    RANGES = {"minutes" : 86400, "days" : 7 * 86400, "floors" : 86400}
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = self.server.query
+        try:
+            args = dict(urlparse.parse_qsl(url.query))
+            if parts == ["trackers"]:
+                result = query.trackers()
+            elif parts == ["stats"]:
+                result = query.stats()
+            elif len(parts) == 3 and parts[0] == "trackers" and parts[2] in self.RANGES:
+                end = int(args.get("end", time.time()))
+                start = int(args.get("start", end - self.RANGES[parts[2]]))
+                result = getattr(query, parts[2])(parts[1], start, end)
+            else:
+                self.send_json(404, {"error" : "no such resource"})
+                return
+        except ValueError, e:
+            self.send_json(400, {"error" : str(e)})
+            return
+        self.send_json(200, result)
+
+    def send_json(self, status, result):
+        body = json.dumps(result)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+def make_server(query, address = ("127.0.0.1", 8001), verbose = False):
+    httpd = BaseHTTPServer.HTTPServer(address, QueryHandler)
+    httpd.query = query
+    httpd.verbose = verbose
+    return httpd
+
+def main():
+    parser = argparse.ArgumentParser(description = "Serve fitbit activity from a SQLite database as JSON")
+    parser.add_argument("database", help = "SQLite database written by the exporter")
+    parser.add_argument("-p", "--port", type = int, default = 8001,
+                        help = "port to listen on")
+    parser.add_argument("-a", "--address", default = "127.0.0.1",
+                        help = "address to listen on")
+    parser.add_argument("-c", "--cache-size", type = int, default = 128,
+                        help = "day summaries to keep in memory")
+    parser.add_argument("-v", "--verbose", action = "store_true",
+                        help = "log every request")
+    args = parser.parse_args()
+    query = ActivityQuery(args.database, args.cache_size)
+    httpd = make_server(query, (args.address, args.port), args.verbose)
+    print "Serving %s on http://%s:%d" % ((args.database,) + httpd.server_address)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    query.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit data bank record decoding
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import collections
+from fitbit_schema import Field, FixedLayout, MarkerLayout, BankRegistry
+
+#: Bank 0, one record per minute
+MinuteRecord = collections.namedtuple("MinuteRecord",
+                                      ["timestamp", "unknown", "active_score", "steps"])
+#: Bank 1, one record per day (or sync?)
+DailyRecord = collections.namedtuple("DailyRecord", ["timestamp", "steps"])
+#: Bank 2, we only know the timestamp so far, data is the rest as hex
+SecondRecord = collections.namedtuple("SecondRecord", ["timestamp", "data"])
+#: Bank 6, one record per minute
+FloorRecord = collections.namedtuple("FloorRecord", ["timestamp", "floors"])
+
+def serial_string(serial):
+    """Returns the hex string used to key records by tracker serial"""
+    return "".join(["%02x" % (x) for x in bytearray(serial)])
+
+#: Layouts of every data bank we know the format of. New formats only
+#: need a layout registered here.
+BANKS = BankRegistry()
+
+# Timestamps are 32-bit bigendian seconds since Jan 1, 1970. No,
+# really. And I think it's because they're prefixing the 3
+# accelerometer reading bytes with 0x80, so they can & against it.
+BANKS.register(0x00, MarkerLayout(MinuteRecord, lambda b: b & 0x80,
+                                  # first byte: I don't know. It
+                                  # starts at 0x81. So we at least
+                                  # subtract that.
+                                  [Field("unknown", "B", lambda v: v - 0x81),
+                                   # active score: subtract 10
+                                   # (because METs start at 1 but 1 is
+                                   # subtracted per minute, see
+                                   # asterisk note on fitbit website),
+                                   # divide by 10.
+                                   Field("active_score", "B", lambda v: (v - 10) / 10.0),
+                                   # steps are easy. It's just the last byte
+                                   Field("steps", "B")]))
+
+# 14 byte records, starting with 32-bit little endian seconds from
+# Jan 1, 1970
+BANKS.register(0x01, FixedLayout(DailyRecord, 14,
+                                 [(0, Field("timestamp", "I")),
+                                  (6, Field("steps", "H"))]))
+
+# 13 byte records, starting with 32-bit little endian seconds from
+# Jan 1, 1970
+BANKS.register(0x02, FixedLayout(SecondRecord, 13,
+                                 [(0, Field("timestamp", "I")),
+                                  (4, Field("data", "9s", lambda v: v.encode("hex")))]))
+
+# 0x80 followed by floors * 10, or a bigendian timestamp
+BANKS.register(0x06, MarkerLayout(FloorRecord, lambda b: b == 0x80,
+                                  [Field(None, "B"),
+                                   Field("floors", "B", lambda v: v / 10)]))
+
+decode_bank0 = BANKS.decoder(0x00)
+decode_bank1 = BANKS.decoder(0x01)
+decode_bank2 = BANKS.decoder(0x02)
+decode_bank6 = BANKS.decoder(0x06)
+
+def decode_bank(bank, data):
+    """Returns an iterator over the records in a data bank dump"""
+    return BANKS.decode(bank, data)
+
+def incremental_decoder(bank):
+    """Returns a decoder for a data bank dump that takes it a chunk at
+    a time, see fitbit_schema.IncrementalDecoder
+
+    """
+    return BANKS.incremental(bank)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit batch reprocessing of archived dumps
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import os, sys, time, hashlib, argparse, multiprocessing
+import fitbit_records, fitbit_schema
+from fitbit_records import BANKS
+from fitbit_archive import DumpArchive
+from fitbit_export import SQLiteExporter
+
+def decoder_version():
+    """Hash of the decoder sources, so improving a decoder makes
+    everything get reprocessed, and nothing else does.
+
+    """
+    h = hashlib.sha1()
+    for module in (fitbit_records, fitbit_schema):
+        path = os.path.splitext(module.__file__)[0] + ".py"
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+def find_work(source):
+    """Returns work units (key, serial, bank, locator) for every dump
+    in an archive or a directory of dump files, for banks we can
+    decode.
+
+    """
+    units = []
+    if os.path.exists(os.path.join(source, "index.db")):
+        archive = DumpArchive(source)
+        for (dump, serial, bank, started, size) in archive.find():
+            if bank in BANKS:
+                units.append(("archive:%d" % (dump), serial, bank, dump))
+        archive.close()
+    else:
+        for name in sorted(os.listdir(source)):
+            m = DumpArchive.NAME.match(name)
+            if m is not None and int(m.group(2), 16) in BANKS:
+                units.append(("file:%s" % (name), m.group(1), int(m.group(2), 16),
+                              os.path.join(source, name)))
+    return units
+
+_archive = None
+
+def _init_worker(source):
+    global _archive
+    if os.path.exists(os.path.join(source, "index.db")):
+        _archive = DumpArchive(source)
+
+def _decode(unit):
+    (key, serial, bank, locator) = unit
+    if _archive is not None:
+        data = _archive.get(locator)
+    else:
+        with open(locator, "rb") as f:
+            data = f.read()
+    return (key, serial, bank, [tuple(r) for r in BANKS.decode(bank, data)])
+
+class Reprocessor(object):
+    """Decodes every dump in an archive or dump directory on a process
+    pool and writes the records to a SQLite database. Dumps already
+    done with the current decoders are skipped, so an interrupted run
+    picks up where it left off.
+
+    """
+
+    def __init__(self, source, db_path, processes = None, chunk_size = 8,
+                 version = None):
+        self.source = source
+        self.exporter = SQLiteExporter(db_path)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.version = version or decoder_version()
+        with self.exporter.db:
+            self.exporter.db.execute("CREATE TABLE IF NOT EXISTS reprocessed "
+                                     "(source TEXT NOT NULL, version TEXT NOT NULL, "
+                                     "PRIMARY KEY (source, version))")
+
+    def pending(self):
+        done = set([row[0] for row in
+                    self.exporter.db.execute("SELECT source FROM reprocessed WHERE version = ?",
+                                             (self.version,))])
+        return [u for u in find_work(self.source) if u[0] not in done]
+
+    def run(self, progress = sys.stderr):
+        units = self.pending()
+        start = time.time()
+        records = 0
+        pool = multiprocessing.Pool(self.processes, _init_worker, (self.source,))
+        try:
+            results = pool.imap_unordered(_decode, units, self.chunk_size)
+            for (n, (key, serial, bank, rows)) in enumerate(results):
+                record = BANKS.layouts[bank].record
+                records += self.exporter.export(serial, bank, [record._make(r) for r in rows])
+                with self.exporter.db:
+                    self.exporter.db.execute("INSERT OR REPLACE INTO reprocessed (source, version) "
+                                             "VALUES (?, ?)", (key, self.version))
+                if progress is not None:
+                    elapsed = max(time.time() - start, 0.001)
+                    progress.write("\r%d/%d dumps, %d records, %.1f dumps/s" %
+                                   (n + 1, len(units), records, (n + 1) / elapsed))
+                    progress.flush()
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        if progress is not None and units:
+            progress.write("\n")
+        return (len(units), records)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Decode archived fitbit data bank dumps into a SQLite database")
+    parser.add_argument("source", help = "dump archive, or directory of <serial>-<bank>-<time>.bin dumps")
+    parser.add_argument("database", help = "SQLite database to write records to")
+    parser.add_argument("-j", "--processes", type = int, default = None,
+                        help = "decoder processes (default: one per core)")
+    parser.add_argument("-c", "--chunk-size", type = int, default = 8,
+                        help = "dumps handed to a process at a time")
+    parser.add_argument("-q", "--quiet", action = "store_true",
+                        help = "don't report progress")
+    parser.add_argument("--redo", metavar = "TAG", default = None,
+                        help = "reprocess dumps that were already done, as run TAG; "
+                        "an interrupted redo resumes when run again with the same TAG")
+    args = parser.parse_args()
+    version = None
+    if args.redo is not None:
+        version = "%s-%s" % (decoder_version(), args.redo)
+    r = Reprocessor(args.source, args.database, args.processes, args.chunk_size, version)
+    (dumps, records) = r.run(None if args.quiet else sys.stderr)
+    print "Reprocessed %d dumps, %d records" % (dumps, records)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
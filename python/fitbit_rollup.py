@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit activity rollups
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import time, datetime
+from fitbit_records import MinuteRecord, FloorRecord
+
+class FenwickTree(object):
+    """Binary indexed tree over a list of numbers that can grow on
+    both ends. Point updates and prefix/range sums are O(log n),
+    appends are O(log n) and prepends are amortized O(1) per slot.
+
+    """
+
+    def __init__(self):
+        self.values = []
+        self._tree = [0]
+
+    def __len__(self):
+        return len(self.values)
+
+    def _prefix(self, n):
+        total = 0
+        while n > 0:
+            total += self._tree[n]
+            n -= n & -n
+        return total
+
+    def append(self, value):
+        self.values.append(value)
+        i = len(self.values)
+        # tree[i] covers (i - lowbit(i), i]
+        self._tree.append(value + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+
+    def prepend(self, count):
+        """Adds count zeros to the front. Rebuilds the tree."""
+        self.values[0:0] = [0] * count
+        tree = [0] + self.values
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def add(self, index, delta):
+        self.values[index] += delta
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def set(self, index, value):
+        self.add(index, value - self.values[index])
+
+    def range_sum(self, start, end):
+        """Sum of values[start:end]"""
+        start = max(start, 0)
+        end = min(end, len(self.values))
+        if end <= start:
+            return 0
+        return self._prefix(end) - self._prefix(start)
+
+def day_start(timestamp):
+    """Local midnight at or before timestamp"""
+    d = datetime.date.fromtimestamp(timestamp)
+    return int(time.mktime(d.timetuple()))
+
+class TrackerRollup(object):
+    """Per minute series for one tracker, kept in Fenwick trees so
+    sums over any time range (an hour, a day, a week) take
+    O(log minutes) no matter how much history there is.
+
+    """
+
+    METRICS = ("steps", "active_score", "floors")
+    #: Records older than this are decoder garbage (no timestamp
+    #: marker seen yet), not real data
+    MIN_TIMESTAMP = 1199145600 # 2008-01-01
+
+    def __init__(self):
+        #: minute (seconds since epoch / 60) of index 0 in the series
+        self.origin = None
+        self.series = dict([(m, FenwickTree()) for m in self.METRICS])
+
+    def _index(self, timestamp):
+        minute = int(timestamp) // 60
+        if self.origin is None:
+            self.origin = minute
+        if minute < self.origin:
+            # Grow by at least the current size, so a run of older
+            # records doesn't rebuild the trees every minute
+            grow = max(self.origin - minute, len(self))
+            for tree in self.series.values():
+                tree.prepend(grow)
+            self.origin -= grow
+        index = minute - self.origin
+        for tree in self.series.values():
+            while len(tree) <= index:
+                tree.append(0)
+        return index
+
+    def __len__(self):
+        return len(self.series[self.METRICS[0]])
+
+    def set_minute(self, metric, timestamp, value):
+        if timestamp < self.MIN_TIMESTAMP:
+            return
+        self.series[metric].set(self._index(timestamp), value)
+
+    def add_records(self, records):
+        for r in records:
+            if isinstance(r, MinuteRecord):
+                self.set_minute("steps", r.timestamp, r.steps)
+                self.set_minute("active_score", r.timestamp, r.active_score)
+            elif isinstance(r, FloorRecord):
+                self.set_minute("floors", r.timestamp, r.floors)
+
+    def sum(self, metric, start, end):
+        """Sum of metric over the minutes in [start, end)"""
+        if self.origin is None:
+            return 0
+        first = -(-int(start) // 60) - self.origin
+        last = -(-int(end) // 60) - self.origin
+        return self.series[metric].range_sum(first, last)
+
+    def buckets(self, metric, start, end, size):
+        """Returns (bucket start, sum) for size second buckets"""
+        return [(t, self.sum(metric, t, min(t + size, end)))
+                for t in range(int(start), int(end), size)]
+
+    def hourly(self, metric, start, end):
+        return self.buckets(metric, start - start % 3600, end, 3600)
+
+    def daily(self, metric, start, end):
+        days = []
+        t = day_start(start)
+        while t < end:
+            # Not t + 86400, days aren't always that long
+            next_day = day_start(t + 25 * 3600)
+            days.append((t, self.sum(metric, t, next_day)))
+            t = next_day
+        return days
+
+    def weekly(self, metric, start, end):
+        return self.buckets(metric, day_start(start), end, 7 * 86400)
+
+    def check_daily(self, daily_records):
+        """Compares bank 1 daily step totals with the sum of the minute
+        data for the same day. Returns (day start, summed, reported)
+        for every day that doesn't match.
+
+        """
+        mismatches = []
+        for r in daily_records:
+            start = day_start(r.timestamp)
+            summed = self.sum("steps", start, day_start(start + 25 * 3600))
+            if summed != r.steps:
+                mismatches.append((start, summed, r.steps))
+        return mismatches
+
+class ActivityRollups(object):
+    """TrackerRollup for every tracker, keyed by serial string"""
+
+    def __init__(self):
+        self.trackers = {}
+
+    def tracker(self, serial):
+        if serial not in self.trackers:
+            self.trackers[serial] = TrackerRollup()
+        return self.trackers[serial]
+
+    def add_records(self, serial, records):
+        self.tracker(serial).add_records(records)
+
+    def sum(self, serial, metric, start, end):
+        if serial not in self.trackers:
+            return 0
+        return self.trackers[serial].sum(metric, start, end)
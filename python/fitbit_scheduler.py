@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit sync scheduler
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import sys, time, random, threading, traceback
+
+class SyncJob(object):
+    """Schedule state for syncing a single tracker. Keeps track of
+    when the next sync is due, and backs off exponentially while
+    syncs keep failing.
+
+    """
+
+    def __init__(self, name, sync, interval, jitter, retry_delay,
+                 max_backoff, min_interval = 0, is_present = None):
+        #: name the job is registered under, usually a tracker id
+        self.name = name
+        #: callable run to do the actual sync
+        self.sync = sync
+        #: seconds between successful syncs
+        self.interval = interval
+        #: maximum random seconds added to every delay
+        self.jitter = jitter
+        #: delay after the first failure, doubled on every failure after
+        self.retry_delay = retry_delay
+        #: upper bound on the failure delay
+        self.max_backoff = max_backoff
+        #: a trigger can't start a sync sooner than this many
+        #: seconds after a successful one
+        self.min_interval = min_interval
+        #: optional callable, returns False if the tracker is known
+        #: to be out of range
+        self.is_present = is_present
+        #: consecutive failed syncs
+        self.failures = 0
+        #: True while a sync for this job is running
+        self.running = False
+        #: time the next sync is due
+        self.next_run = time.time()
+        #: a trigger can't move the next sync earlier than this
+        self.not_before = 0
+
+    def _delay(self, delay):
+        return delay + random.uniform(0, self.jitter)
+
+    def succeeded(self, now):
+        self.failures = 0
+        self.not_before = now + self.min_interval
+        self.next_run = now + self._delay(self.interval)
+
+    def failed(self, now):
+        self.failures += 1
+        backoff = min(self.max_backoff,
+                      self.retry_delay * 2 ** (self.failures - 1))
+        self.not_before = now + self._delay(backoff)
+        self.next_run = self.not_before
+
+    def skipped(self, now):
+        self.next_run = now + self._delay(self.interval)
+
+    def trigger(self, now):
+        self.next_run = max(now, self.not_before)
+
+class SyncScheduler(object):
+    """Runs sync jobs when they're due, with at most max_concurrent
+    syncs in flight at once. Jobs can be made due early with
+    trigger(), e.g. when a tracker beacon is seen.
+
+    """
+
+    def __init__(self, max_concurrent = 1):
+        self.jobs = {}
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def add_job(self, name, sync, interval = 15 * 60, jitter = 30,
+                retry_delay = 30, max_backoff = 60 * 60, min_interval = 60,
+                is_present = None):
+        with self._cond:
+            job = SyncJob(name, sync, interval, jitter, retry_delay,
+                          max_backoff, min_interval, is_present)
+            self.jobs[name] = job
+            self._cond.notify()
+        return job
+
+    def remove_job(self, name):
+        with self._cond:
+            self.jobs.pop(name, None)
+
+    def trigger(self, name = None):
+        """Makes a job due now (or all jobs, if name is None). Jobs
+        that are backing off from a failure, or that synced less than
+        min_interval seconds ago, stay put.
+
+        """
+        with self._cond:
+            now = time.time()
+            for job in self.jobs.values():
+                if name is None or job.name == name:
+                    job.trigger(now)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _run_job(self, job):
+        try:
+            job.sync()
+        except Exception, e:
+            print "Sync %s failed with" % (job.name,), e
+            print
+            print '-'*60
+            traceback.print_exc(file=sys.stdout)
+            print '-'*60
+            result = job.failed
+        else:
+            print "Sync %s finished" % (job.name,)
+            result = job.succeeded
+        finally:
+            self._slots.release()
+        with self._cond:
+            job.running = False
+            result(time.time())
+            self._cond.notify()
+
+    def run_pending(self):
+        """Starts every due job there's a free slot for. Returns the
+        number of seconds until the next job is due.
+
+        """
+        with self._cond:
+            now = time.time()
+            for job in sorted(self.jobs.values(), key = lambda j: j.next_run):
+                if job.running or job.next_run > now:
+                    continue
+                if job.is_present is not None and not job.is_present():
+                    job.skipped(now)
+                    continue
+                if not self._slots.acquire(False):
+                    break
+                job.running = True
+                t = threading.Thread(target = self._run_job, args = (job,))
+                t.daemon = True
+                t.start()
+            # Jobs that are due but didn't get a slot are started
+            # when a running job finishes, so only count future ones.
+            waiting = [j.next_run for j in self.jobs.values()
+                       if not j.running and j.next_run > now]
+            if not waiting:
+                return None
+            return min(waiting) - now
+
+    def run_forever(self):
+        with self._cond:
+            while not self._stopped:
+                # Jobs finishing, new jobs and triggers all notify, so
+                # we only need to wake up on our own when something
+                # becomes due. Waiting without a timeout can't be
+                # interrupted with ctrl-c, so cap it.
+                delay = self.run_pending()
+                if delay is None or delay > 60:
+                    delay = 60
+                self._cond.wait(delay)
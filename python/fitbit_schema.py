@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit data bank schemas
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import struct
+
+class Field(object):
+    """One field of a bank record. fmt is a struct format character
+    (without byte order). A field without a name is skipped, and
+    convert, if given, is applied to the unpacked value.
+
+    """
+
+    def __init__(self, name, fmt, convert = None):
+        self.name = name
+        self.fmt = fmt
+        self.convert = convert
+
+    @property
+    def size(self):
+        return struct.calcsize("<" + self.fmt)
+
+def _record_args(fields, byteorder, env):
+    """Returns (struct format or None, size covered, source for the
+    record's arguments) for a list of (offset, Field). Layouts made only of
+    byte fields index the data directly, anything else is unpacked
+    with a single struct into v. Converters of byte fields are turned
+    into 256 entry lookup tables.
+
+    """
+    fields = sorted(fields, key = lambda f: f[0])
+    direct = not [f for (o, f) in fields if f.name is not None and f.fmt != "B"]
+    fmt = byteorder
+    pos = 0
+    args = []
+    for (offset, field) in fields:
+        if offset > pos:
+            fmt += "%dx" % (offset - pos)
+        pos = offset + field.size
+        if field.name is None:
+            fmt += "%dx" % (field.size)
+            continue
+        fmt += field.fmt
+        if direct:
+            value = "data[i + %d]" % (offset)
+        else:
+            value = "v[%d]" % (len(args))
+        if field.convert is not None:
+            name = "c%d" % (len(args))
+            if field.fmt == "B":
+                # Byte fields only have 256 values, so convert them
+                # all up front and look them up from then on
+                env[name] = [field.convert(b) for b in range(256)]
+                value = "%s[%s]" % (name, value)
+            else:
+                env[name] = field.convert
+                value = "%s(%s)" % (name, value)
+        args.append(value)
+    if direct:
+        fmt = None
+    return (fmt, pos, ", ".join(args))
+
+def _compile(source, env):
+    exec source in env
+    return (env["decode"], env["scan"])
+
+class IncrementalDecoder(object):
+    """Decodes a bank dump a chunk at a time, in whatever pieces it
+    arrives in. A record or timestamp split across two chunks is held
+    over until the rest of it shows up, along with the current
+    timestamp and record index, so feeding every chunk gives the same
+    records as decoding the whole dump.
+
+    """
+
+    def __init__(self, scan):
+        self.scan = scan
+        #: bytes of a record we've only seen part of
+        self.pending = bytearray()
+        self.tstamp = 0
+        self.time_index = 0
+
+    def feed(self, chunk):
+        """Returns the records completed by chunk"""
+        data = self.pending + chunk
+        records = []
+        (i, self.tstamp, self.time_index) = \
+            self.scan(data, 0, self.tstamp, self.time_index, records.append)
+        self.pending = data[i:]
+        return records
+
+class FixedLayout(object):
+    """Bank of back to back records of size bytes each. fields is a
+    list of (offset, Field), in the same order as the record's fields.
+
+    """
+
+    def __init__(self, record, size, fields, byteorder = "<"):
+        self.record = record
+        self.size = size
+        self.fields = fields
+        self.byteorder = byteorder
+        self.decode = None
+        self.scan = None
+
+    def compile(self):
+        env = {"record" : self.record}
+        (fmt, covered, args) = _record_args(self.fields, self.byteorder, env)
+        unpack = ""
+        if fmt is not None:
+            env["unpack"] = struct.Struct(fmt).unpack_from
+            unpack = "v = unpack(data, i)"
+        # Trailing partial records are dropped by decode, and left for
+        # the next chunk by scan
+        (self.decode, self.scan) = _compile("""
+def decode(data):
+    if not isinstance(data, bytearray):
+        data = bytearray(data)
+    for i in xrange(0, len(data) - %(size)d + 1, %(size)d):
+        %(unpack)s
+        yield record(%(args)s)
+
+def scan(data, start, tstamp, time_index, append):
+    end = start + (len(data) - start) // %(size)d * %(size)d
+    for i in xrange(start, end, %(size)d):
+        %(unpack)s
+        append(record(%(args)s))
+    return (end, tstamp, time_index)
+""" % {"size" : self.size, "unpack" : unpack, "args" : args}, env)
+        return self.decode
+
+    def incremental(self):
+        return IncrementalDecoder(self.scan)
+
+class MarkerLayout(object):
+    """Bank of timestamps, each followed by records one interval
+    seconds apart. A record is recognized by is_record(first byte),
+    anything else starts a timestamp. fields is a list of Field
+    covering the record, and the record type gets the timestamp
+    followed by the named fields.
+
+    """
+
+    def __init__(self, record, is_record, fields, timestamp = "I",
+                 interval = 60, byteorder = ">"):
+        self.record = record
+        self.is_record = is_record
+        self.fields = fields
+        self.timestamp = timestamp
+        self.interval = interval
+        self.byteorder = byteorder
+        self.decode = None
+        self.scan = None
+
+    def compile(self):
+        offsets = []
+        size = 0
+        for field in self.fields:
+            offsets.append((size, field))
+            size += field.size
+        timestamp = struct.Struct(self.byteorder + self.timestamp)
+        env = {"record" : self.record,
+               "is_record" : [bool(self.is_record(b)) for b in range(256)],
+               "unpack_timestamp" : timestamp.unpack_from}
+        (fmt, covered, args) = _record_args(offsets, self.byteorder, env)
+        unpack = ""
+        if fmt is not None:
+            env["unpack"] = struct.Struct(fmt).unpack_from
+            unpack = "v = unpack(data, i)"
+        # Same loop for both, decode yields records and stops at a
+        # partial one, scan hands them to append and says where the
+        # partial one starts.
+        loop = """
+    end = len(data)
+    while i < end:
+        if is_record[data[i]]:
+            if i + %(record)d > end:
+                break
+            %(unpack)s
+            %(emit)s(record(tstamp + %(interval)d * time_index, %(args)s))
+            i += %(record)d
+            time_index += 1
+        else:
+            if i + %(timestamp)d > end:
+                break
+            tstamp = unpack_timestamp(data, i)[0]
+            i += %(timestamp)d
+            time_index = 0
+"""
+        params = {"record" : size, "timestamp" : timestamp.size,
+                  "interval" : self.interval, "unpack" : unpack, "args" : args}
+        (self.decode, self.scan) = _compile("""
+def decode(data):
+    if not isinstance(data, bytearray):
+        data = bytearray(data)
+    i = 0
+    tstamp = 0
+    time_index = 0
+%s
+def scan(data, i, tstamp, time_index, append):
+%s
+    return (i, tstamp, time_index)
+""" % (loop % dict(params, emit = "yield "), loop % dict(params, emit = "append")), env)
+        return self.decode
+
+    def incremental(self):
+        return IncrementalDecoder(self.scan)
+
+class BankRegistry(object):
+    """Layout for every data bank we know the format of. Layouts are
+    compiled into decoders once, when they're registered.
+
+    """
+
+    def __init__(self):
+        self.layouts = {}
+
+    def register(self, bank, layout):
+        layout.compile()
+        self.layouts[bank] = layout
+        return layout
+
+    def __contains__(self, bank):
+        return bank in self.layouts
+
+    def decoder(self, bank):
+        if bank not in self.layouts:
+            raise Exception("No decoder for data bank %d" % (bank))
+        return self.layouts[bank].decode
+
+    def decode(self, bank, data):
+        """Returns an iterator over the records in a data bank dump"""
+        return self.decoder(bank)(data)
+
+    def incremental(self, bank):
+        """Returns an IncrementalDecoder for a data bank, to decode a
+        dump as its chunks come in
+
+        """
+        self.decoder(bank)
+        return self.layouts[bank].incremental()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+#################################################################
+# python stand-in fitbit upload server
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import sys, time, base64, urllib, urlparse, threading, BaseHTTPServer
+from xml.sax.saxutils import escape
+
+START_PATH = "/device/tracker/uploadData"
+
+def remote_op(opcode, payload = None):
+    return (bytearray(opcode), None if payload is None else bytearray(payload))
+
+def default_chain(banks = (0, 1), dumps = 1, erase = True):
+    """Request chain shaped like the one the website runs: get the
+    tracker info, dump the data banks (dumps times over), then erase
+    them. Each step is (path, [remote ops]); the reply to a request
+    for a step's path carries that step's ops, and points at the next
+    step's path.
+
+    """
+    chain = [(START_PATH, [remote_op([0x24, 0, 0, 0, 0, 0, 0])])]
+    for n in range(dumps):
+        chain.append(("/device/tracker/dumpData/lookupTracker",
+                      [remote_op([0x22, bank, 0, 0, 0, 0, 0]) for bank in banks]))
+    if erase:
+        chain.append(("/device/tracker/dumpData/dumpData",
+                      [remote_op([0x25, bank, 0, 0, 0, 0, 0]) for bank in banks]))
+    chain.append(("/device/tracker/dumpData/clearDataConfigTracker", []))
+    return chain
+
+class UploadRequest(object):
+    """A request the server received"""
+
+    def __init__(self, path, form, received):
+        self.path = path
+        #: the posted form, as a dict
+        self.form = form
+        self.received = received
+
+    def op_responses(self):
+        """Decoded opResponse fields, in order"""
+        responses = []
+        while "opResponse[%d]" % len(responses) in self.form:
+            responses.append(bytearray(base64.b64decode(self.form["opResponse[%d]" % len(responses)])))
+        return responses
+
+class UploadHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.getheader("Content-Length", 0)))
+        path = urlparse.urlparse(self.path).path
+        reply = self.server.upload.handle(path, dict(urlparse.parse_qsl(body)))
+        if reply is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        if self.server.upload.debug:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class UploadServer(object):
+    """Local stand-in for client.fitbit.com. Answers the upload
+    request chain with canned remoteOps, and records what the client
+    posted back, so the client can be run and timed end to end without
+    the website. Point the client at it with
+
+        client.FITBIT_HOST = server.url
+
+    latency is added to every reply, to model the website's think time.
+
+    """
+
+    def __init__(self, chain = None, latency = 0, address = ("127.0.0.1", 0),
+                 debug = False):
+        self.chain = chain or default_chain()
+        self.latency = latency
+        self.debug = debug
+        #: UploadRequest for every request received
+        self.requests = []
+        self._lock = threading.Lock()
+        self._httpd = BaseHTTPServer.HTTPServer(address, UploadHandler)
+        self._httpd.upload = self
+        self._thread = None
+        self._next = None
+
+    @property
+    def host(self):
+        return "%s:%d" % self._httpd.server_address
+
+    @property
+    def url(self):
+        return "http://" + self.host
+
+    def start(self):
+        self._thread = threading.Thread(target = self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+            self._next = None
+
+    def handle(self, path, form):
+        with self._lock:
+            self.requests.append(UploadRequest(path, form, time.time()))
+            # Paths can repeat in a chain, so go by where the last
+            # reply pointed
+            step = self._next
+            if path == START_PATH or step is None or self.chain[step][0] != path:
+                steps = [p for (p, ops) in self.chain]
+                if path not in steps:
+                    return None
+                step = steps.index(path)
+            self._next = step + 1 if step + 1 < len(self.chain) else None
+        if self.latency:
+            time.sleep(self.latency)
+        following = self.chain[step + 1][0] if step + 1 < len(self.chain) else None
+        return self.reply(self.chain[step][1], following)
+
+    def reply(self, ops, path = None):
+        xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<fitbitClient version="1.0">']
+        if path is not None:
+            query = urllib.urlencode({"trackerPublicId" : "0000000", "userPublicId" : "0000000"})
+            xml.append('<response host="%s" path="%s">%s</response>' %
+                       (self.host, path, escape(query)))
+        xml.append('<device type="tracker" serialNumber="0102030405">')
+        xml.append('<remoteOps>')
+        for (opcode, payload) in ops:
+            xml.append('<remoteOp encrypted="false"><opCode>%s</opCode><payloadData>%s</payloadData></remoteOp>' %
+                       (base64.b64encode(opcode), base64.b64encode(payload) if payload else ""))
+        xml.append('</remoteOps>')
+        xml.append('</device>')
+        xml.append('</fitbitClient>')
+        return "\n".join(xml)
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = UploadServer(address = ("127.0.0.1", port), debug = True)
+    print "Serving uploads on %s" % (server.url,)
+    server.serve_forever()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
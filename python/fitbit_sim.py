@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+#################################################################
+# python simulated fitbit base and tracker
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import time, array, operator, collections
+import usb.core
+from antprotocol.protocol import ANT
+
+class SimulatedBase(ANT):
+    """ANT base with a simulated tracker behind it, for running the
+    FitBit and FitBitClient code without hardware. Speaks ANT at the
+    message level, so everything from _receive_message up is the real
+    code.
+
+    Banks are given as {bank id: data}. lose(bank_id) can return True
+    to make the burst for that data bank chunk fail, to simulate a
+    noisy link.
+
+    """
+
+    NAME = "Simulated"
+
+    def __init__(self, banks = None, serial = [0x01, 0x02, 0x03, 0x04, 0x05],
+                 chunk_size = 128, message_delay = 0, lose = None, debug = False):
+        super(SimulatedBase, self).__init__(0x00, debug)
+        self.banks = dict([(b, bytearray(d)) for (b, d) in (banks or {}).items()])
+        self.serial = bytearray(serial)
+        self.chunk_size = chunk_size
+        #: seconds each message from the tracker takes to arrive
+        self.message_delay = message_delay
+        self.lose = lose
+        #: every message sent to the base
+        self.sent = []
+        #: (opcode, payload) for every payload written to the tracker
+        self.payloads = []
+        #: (bank, timestamp) for every erase
+        self.erased = []
+        self._open = False
+        self._pending = collections.deque()
+        self._stream = []
+        self._burst = bytearray()
+        self._opcode = None
+
+    def open(self, vid = None, pid = None, bus = None, address = None):
+        self._open = True
+        return True
+
+    def is_open(self):
+        return self._open
+
+    def close(self):
+        self._open = False
+
+    def reset(self):
+        # Same as ANT.reset, minus the wait for real hardware
+        self._send_message(0x4a, 0x00)
+        self._check_reset_response(0x20)
+
+    def _reply(self, msg_id, *data):
+        m = bytearray([0xa4, len(data), msg_id]) + bytearray(data)
+        m.append(reduce(operator.xor, m))
+        self._pending.append(m)
+
+    def _receive(self, size = 4096):
+        if not self._pending:
+            raise usb.core.USBError("Operation timed out")
+        if self.message_delay:
+            time.sleep(self.message_delay)
+        return array.array('B', str(self._pending.popleft()))
+
+    def _send(self, command):
+        command = bytearray(command)
+        self.sent.append(command)
+        (msg_id, body) = (command[2], command[3:-1])
+        if msg_id == 0x4a:
+            self._reply(0x6f, 0x20)
+        elif msg_id == 0x4b:
+            self._reply(0x40, body[0], msg_id, 0x00)
+            # Tracker is always in range
+            self._reply(0x4e, body[0], 0, 0, 0, 0, 0, 0, 0, 0)
+        elif msg_id in (0x42, 0x43, 0x44, 0x45, 0x46, 0x47, 0x4c, 0x51):
+            self._reply(0x40, body[0], msg_id, 0x00)
+        elif msg_id == 0x4d:
+            # Channel id request, as a device number
+            self._reply(0x51, body[0], self.serial[0], self.serial[1], 0x01, 0x01)
+        elif msg_id == 0x4f:
+            self._reply(0x40, body[0], 0x01, 0x05)
+            self._tracker_packet(body[1:])
+        elif msg_id == 0x50:
+            self._burst += body[1:]
+            if body[0] & 0x80:
+                self._reply(0x40, 0x00, 0x01, 0x05)
+                (burst, self._burst) = (self._burst, bytearray())
+                # Header is packet id, 0x80, length, 4 x 0, checksum
+                self.payloads.append((self._opcode, burst[8:8+burst[2]]))
+                self._reply(0x4f, 0x00, burst[0], 0x41, 0, 0, 0, 0, 0, 0)
+
+    def _tracker_packet(self, p):
+        if p[0] in (0x78, 0x7f):
+            # Link management (reset, hop, ping) and sleep
+            return
+        (pid, cmd) = (p[0], p[1])
+        if cmd == 0x24:
+            self._stream = [self.serial + bytearray([0x0c, 0x02, 0x17, 0x02, 0x17, 0x00, 0x01, 0x00])]
+            self._reply(0x4f, 0x00, pid, 0x42, 0, 0, 0, 0, 0, 0)
+        elif cmd == 0x22:
+            data = self.banks.get(p[2], bytearray())
+            self._stream = [data[i:i+self.chunk_size]
+                            for i in range(0, len(data), self.chunk_size)]
+            self._reply(0x4f, 0x00, pid, 0x42, 0, 0, 0, 0, 0, 0)
+        elif cmd == 0x25:
+            self.erased.append((p[2], p[3] << 24 | p[4] << 16 | p[5] << 8 | p[6]))
+            self.banks.pop(p[2], None)
+            self._reply(0x4f, 0x00, pid, 0x41, 0, 0, 0, 0, 0, 0)
+        elif cmd in (0x70, 0x60):
+            if self.lose is not None and self.lose(p[4]):
+                # EVENT_TRANSFER_RX_FAILED
+                self._reply(0x40, 0x00, 0x01, 0x04)
+                return
+            chunk = self._stream.pop(0) if self._stream else bytearray()
+            self._send_burst(pid, chunk)
+        else:
+            # Anything else wants a payload
+            self._opcode = p[1:]
+            self._reply(0x4f, 0x00, pid, 0x61, 0, 0, 0, 0, 0, 0)
+
+    def _send_burst(self, pid, chunk):
+        data = bytearray([pid, 0x81, len(chunk) & 0xff, len(chunk) >> 8, 0, 0, 0, 0]) + chunk
+        data += bytearray(-len(data) % 8)
+        packets = len(data) / 8
+        for n in range(packets):
+            seq = (n - 1) % 3 * 0x20 + 0x20 if n else 0x00
+            if n == packets - 1:
+                seq |= 0x80
+            self._reply(0x50, seq, *data[n*8:n*8+8])
+
+def minute_bank(start, hours, steps = 7):
+    """Bank 0 data for hours of minute records starting at start"""
+    data = bytearray()
+    for h in range(hours):
+        t = start + h * 3600
+        data += bytearray([t >> 24, (t >> 16) & 0xff, (t >> 8) & 0xff, t & 0xff])
+        data += bytearray([0x81, 0x1c, steps]) * 60
+    return data
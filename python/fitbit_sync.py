@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit transactional data bank sync
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import os, time, struct, hashlib
+from fitbit_records import serial_string, BANKS
+from fitbit_schema import FixedLayout
+
+class DumpJournal(object):
+    """Append only checkpoint file for a data bank dump in progress.
+    Every chunk received from the tracker is written and synced to
+    disk with its bank id before we ask for the next one.
+
+    """
+
+    HEADER = struct.Struct("<4sIHB")
+    CHUNK = struct.Struct("<IH")
+    MAGIC = "FBJ1"
+
+    def __init__(self, directory, serial, bank):
+        self.path = os.path.join(directory, "%s-%02x.journal" % (serial, bank))
+        self.bank = bank
+        self._file = None
+
+    def begin(self, started, channel_id):
+        """Starts a new journal, throwing away any old one. That's
+        safe: a bank is only erased once its dump is stored, so an old
+        journal's chunks are still on the tracker, and they can't be
+        continued on a new link anyway.
+
+        """
+        self.close()
+        self._file = open(self.path, "wb")
+        cid = bytearray(channel_id or [0, 0])
+        self._write(self.HEADER.pack(self.MAGIC, started, cid[0] | cid[1] << 8, self.bank))
+
+    def reopen(self):
+        """Continues appending to the journal on disk"""
+        self.close()
+        self._file = open(self.path, "ab")
+
+    def append(self, bank_id, chunk):
+        self._write(self.CHUNK.pack(bank_id, len(chunk)) + str(chunk))
+
+    def _write(self, data):
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def load(self):
+        """Returns (started, channel id, [(bank id, chunk), ...]) from
+        the journal on disk, or None if there isn't a usable one. A
+        chunk torn by a crash is dropped.
+
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if len(data) < self.HEADER.size:
+            return None
+        (magic, started, cid, bank) = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or bank != self.bank:
+            return None
+        chunks = []
+        i = self.HEADER.size
+        while i + self.CHUNK.size <= len(data):
+            (bank_id, size) = self.CHUNK.unpack_from(data, i)
+            i += self.CHUNK.size
+            if i + size > len(data):
+                break
+            chunks.append((bank_id, bytearray(data[i:i+size])))
+            i += size
+        return (started, [cid & 0xff, cid >> 8], chunks)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def write_durably(path, data):
+    """Writes data to path so that it's either all there or not there
+    at all, even if we crash or lose power part way.
+
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, path)
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class BankTransaction(object):
+    """Dumps a data bank, verifies the dump, stores it durably and only
+    then erases the bank on the tracker.
+
+    Dumps are stored as <serial>-<bank>-<dump start time>.bin in
+    store_dir. If persist is given, it's also called with the serial
+    string, bank and data (e.g. an exporter's export_bank) before the
+    erase, so the erase waits on that too.
+
+    """
+
+    def __init__(self, session, bank, store_dir, persist = None, tries = 3):
+        self.session = session
+        self.bank = bank
+        self.store_dir = store_dir
+        self.persist = persist
+        self.tries = tries
+        #: tracker serial string, where save stored the dump, None
+        #: until it has
+        self.serial = None
+        self.path = None
+        #: dump start time, the newest erase timestamp allowed
+        self.started = None
+
+    def _serial(self):
+        fitbit = self.session.fitbit
+        if fitbit.serial is None:
+            fitbit.parse_info_packet(self.session.run_opcode([0x24, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]))
+        return serial_string(fitbit.serial)
+
+    def dump(self, journal):
+        """Dumps the bank, checkpointing every chunk to the journal. A
+        transfer that fails part way is picked up from the failed chunk
+        while the link to the tracker is still up, and restarted from
+        the beginning otherwise. Returns (dump start time, data).
+
+        """
+        fitbit = self.session.fitbit
+        for tries in range(self.tries):
+            saved = journal.load()
+            try:
+                if saved is not None and saved[2] and \
+                   saved[1] == fitbit.channel_id and \
+                   saved[2][-1][0] + 1 == fitbit.current_bank_id:
+                    # Same link, and the tracker is still waiting on
+                    # the chunk after the last one we have
+                    journal.reopen()
+                    data = self.session.resume_data_bank(bytearray().join([c for (i, c) in saved[2]]),
+                                                         journal.append)
+                    if data is not None:
+                        return (saved[0], data)
+                self.session.ensure()
+                started = int(time.time())
+                journal.begin(started, fitbit.channel_id)
+                data = self.session.run_opcode([0x22, self.bank, 0x00, 0x00, 0x00, 0x00, 0x00],
+                                               on_chunk = journal.append)
+                return (started, data)
+            except Exception, e:
+                print "Dump of bank %d failed: %s" % (self.bank, e)
+                if tries == self.tries - 1:
+                    raise
+
+    def verify(self, journal, data):
+        saved = journal.load()
+        if saved is None:
+            raise Exception("Bank %d: no journal for dump" % (self.bank))
+        chunks = saved[2]
+        if not chunks or len(chunks[-1][1]) != 0:
+            raise Exception("Bank %d: dump didn't reach the end of the bank" % (self.bank))
+        if bytearray().join([c for (i, c) in chunks]) != data:
+            raise Exception("Bank %d: dump doesn't match journal" % (self.bank))
+        layout = BANKS.layouts.get(self.bank)
+        if isinstance(layout, FixedLayout) and len(data) % layout.size:
+            raise Exception("Bank %d: dump of %d bytes isn't whole %d byte records" %
+                            (self.bank, len(data), layout.size))
+
+    def store(self, serial, started, data):
+        path = os.path.join(self.store_dir, "%s-%02x-%d.bin" % (serial, self.bank, started))
+        write_durably(path, data)
+        with open(path, "rb") as f:
+            if hashlib.sha1(f.read()).digest() != hashlib.sha1(data).digest():
+                raise Exception("Bank %d: stored dump doesn't match" % (self.bank))
+        if self.persist is not None:
+            self.persist(serial, self.bank, data)
+        return path
+
+    def save(self):
+        """Dumps, verifies and stores the bank, and returns the dump.
+        Anything going wrong raises, and the bank can't be erased.
+
+        """
+        if not os.path.isdir(self.store_dir):
+            os.makedirs(self.store_dir)
+        serial = self._serial()
+        journal = DumpJournal(self.store_dir, serial, self.bank)
+        try:
+            (started, data) = self.dump(journal)
+            self.verify(journal, data)
+            self.path = self.store(serial, started, data)
+            self.serial = serial
+            self.started = started
+        finally:
+            journal.close()
+        journal.discard()
+        return data
+
+    def erase(self, tstamp = None):
+        """Erases the bank on the tracker, once save has stored it.
+        Only what was on the tracker when the dump started gets
+        erased, even if a later tstamp is asked for, so anything
+        logged since then stays for the next sync.
+
+        """
+        if self.path is None:
+            raise Exception("Bank %d: refusing to erase, dump isn't stored" % (self.bank))
+        if tstamp is None or tstamp > self.started:
+            tstamp = self.started
+        return self.session.run_opcode([0x25, self.bank,
+                                        (tstamp & 0xff000000) >> 24,
+                                        (tstamp & 0x00ff0000) >> 16,
+                                        (tstamp & 0x0000ff00) >> 8,
+                                        (tstamp & 0x000000ff),
+                                        0x00])
+
+    def run(self, erase = True):
+        """Runs the whole transaction. Returns the path of the stored
+        dump. Anything going wrong before the erase raises, leaving
+        the bank on the tracker untouched.
+
+        """
+        self.save()
+        if erase:
+            self.erase()
+        return self.path
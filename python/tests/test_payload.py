@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit payload burst tests
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import random, operator, itertools, unittest
+from fitbit import pack_payload_burst, xor_checksum, FitBit
+from fitbit_sim import SimulatedBase
+from fitbit_bench import PayloadBenchmark, quiet
+
+def old_payload_burst(packet_id, payload, chan = 0):
+    """The burst layout FitBit.send_tracker_payload built before
+    pack_payload_burst, packet by packet
+
+    """
+    p = [0x00, packet_id, 0x80, len(payload), 0x00, 0x00, 0x00, 0x00, reduce(operator.xor, map(ord, payload))]
+    prefix = itertools.cycle([0x20, 0x40, 0x60])
+    for i in range(0, len(payload), 8):
+        current_prefix = prefix.next()
+        plist = []
+        if i+8 >= len(payload):
+            plist += [(current_prefix + 0x80) | chan]
+        else:
+            plist += [current_prefix | chan]
+        plist += map(ord, payload[i:i+8])
+        while len(plist) < 9:
+            plist += [0x0]
+        p += plist
+    return bytearray(p)
+
+class PayloadBurstTest(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(0)
+
+    def payload(self, size):
+        return "".join([chr(self.random.getrandbits(8)) for i in range(size)])
+
+    def test_same_as_old_packetizer(self):
+        for size in range(1, 256):
+            payload = self.payload(size)
+            for chan in (0, 1):
+                packet_id = 0x38 + size % 8
+                self.assertEqual(pack_payload_burst(packet_id, payload, chan),
+                                 old_payload_burst(packet_id, payload, chan),
+                                 "%d byte payload, channel %d" % (size, chan))
+
+    def test_empty_payload(self):
+        self.assertEqual(pack_payload_burst(0x39, ""),
+                         bytearray([0, 0x39, 0x80, 0, 0, 0, 0, 0, 0]))
+
+    def test_xor_checksum(self):
+        for size in range(0, 300):
+            data = bytearray(self.payload(size))
+            self.assertEqual(xor_checksum(data), reduce(operator.xor, data, 0),
+                             "%d bytes" % (size))
+
+    def test_tracker_gets_payload(self):
+        bench = PayloadBenchmark(100)
+        (elapsed, ok) = bench.write(3)
+        self.assertTrue(ok)
+
+if __name__ == '__main__':
+    unittest.main()
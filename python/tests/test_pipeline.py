@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit sync pipeline tests
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import multiprocessing, unittest
+from fitbit_pipeline import FrameRing, FRAME_BANK, pack_bank_frame, unpack_frame
+
+def _produce(ring, count):
+    for i in range(count):
+        ring.put(str(i) * (i % 7 + 1))
+
+class FrameRingTest(unittest.TestCase):
+
+    def test_wraps_around(self):
+        ring = FrameRing(64)
+        for i in range(100):
+            frame = "x" * (i % 20)
+            self.assertTrue(ring.put(frame))
+            self.assertEqual(ring.get(), frame)
+
+    def test_timeouts(self):
+        ring = FrameRing(32)
+        self.assertEqual(ring.get(0), None)
+        self.assertTrue(ring.put("a" * 20))
+        self.assertFalse(ring.put("b" * 20, 0.01))
+        self.assertEqual(ring.get(0), "a" * 20)
+
+    def test_frame_too_big(self):
+        self.assertRaises(ValueError, FrameRing(32).put, "x" * 32)
+
+    def test_between_processes(self):
+        ring = FrameRing(64)
+        producer = multiprocessing.Process(target = _produce, args = (ring, 200))
+        producer.start()
+        frames = [ring.get(5) for i in range(200)]
+        producer.join()
+        self.assertEqual(frames, [str(i) * (i % 7 + 1) for i in range(200)])
+
+    def test_bank_frame(self):
+        frame = pack_bank_frame(bytearray([1, 2, 3, 4, 5]), 0x02, 1300000000, bytearray("data"))
+        self.assertEqual(unpack_frame(frame),
+                         (FRAME_BANK, "\x01\x02\x03\x04\x05", 0x02, 1300000000, "data"))
+
+if __name__ == '__main__':
+    unittest.main()
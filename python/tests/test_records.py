@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit data bank decoding tests
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import struct, unittest
+from fitbit_records import decode_bank, incremental_decoder, serial_string, \
+    MinuteRecord, DailyRecord, FloorRecord
+from fitbit_sim import minute_bank
+
+def floor_bank(start, minutes):
+    data = bytearray(struct.pack(">I", start))
+    for m in range(minutes):
+        data += bytearray([0x80, m % 4 * 10])
+    return data
+
+class DecodeTest(unittest.TestCase):
+
+    def test_bank0(self):
+        records = list(decode_bank(0x00, minute_bank(1300000000, 2, 5)))
+        self.assertEqual(len(records), 120)
+        self.assertEqual(records[0], MinuteRecord(1300000000, 0, 1.8, 5))
+        self.assertEqual(records[59].timestamp, 1300000000 + 59 * 60)
+        self.assertEqual(records[60].timestamp, 1300003600)
+
+    def test_bank1(self):
+        data = struct.pack("<IHH6x", 1300000000, 0, 1234) + \
+               struct.pack("<IHH6x", 1300086400, 0, 4321)
+        self.assertEqual(list(decode_bank(0x01, data)),
+                         [DailyRecord(1300000000, 1234), DailyRecord(1300086400, 4321)])
+
+    def test_bank6(self):
+        self.assertEqual(list(decode_bank(0x06, floor_bank(1300000000, 3))),
+                         [FloorRecord(1300000000, 0), FloorRecord(1300000060, 1),
+                          FloorRecord(1300000120, 2)])
+
+    def test_serial_string(self):
+        self.assertEqual(serial_string(bytearray([0x01, 0xab, 0x00])), "01ab00")
+
+class IncrementalDecodeTest(unittest.TestCase):
+    """Feeding a dump in chunks, split anywhere, has to give the same
+    records as decoding it whole
+
+    """
+
+    def check(self, bank, data):
+        whole = list(decode_bank(bank, data))
+        self.assertTrue(whole)
+        for size in (1, 2, 3, 5, 7, 13, 20, 128, len(data)):
+            decoder = incremental_decoder(bank)
+            records = []
+            for i in range(0, len(data), size):
+                records.extend(decoder.feed(data[i:i+size]))
+            self.assertEqual(records, whole, "%d byte chunks" % (size))
+
+    def test_bank0(self):
+        self.check(0x00, minute_bank(1300000000, 3))
+
+    def test_bank1(self):
+        self.check(0x01, bytearray("".join([struct.pack("<IHH6x", 1300000000 + d * 86400, 0, d)
+                                            for d in range(5)])))
+
+    def test_bank6(self):
+        self.check(0x06, floor_bank(1300000000, 30) + floor_bank(1300003600, 30))
+
+if __name__ == '__main__':
+    unittest.main()
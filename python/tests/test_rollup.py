@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#################################################################
+# python fitbit activity rollup tests
+# Distributed as part of the libfitbit project
+#
+# Repo: http://www.github.com/openyou/libfitbit
+#
+# Licensed under the BSD License, as follows
+#
+# Copyright (c) 2026, the libfitbit contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms,
+# with or without modification, are permitted provided
+# that the following conditions are met:
+#
+#    * Redistributions of source code must retain the
+#      above copyright notice, this list of conditions
+#      and the following disclaimer.
+#    * Redistributions in binary form must reproduce the
+#      above copyright notice, this list of conditions and
+#      the following disclaimer in the documentation and/or
+#      other materials provided with the distribution.
+#    * Neither the name of the libfitbit project nor the names
+#      of its contributors may be used to endorse or promote
+#      products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+# CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#################################################################
+
+import random, unittest
+from fitbit_rollup import FenwickTree, TrackerRollup, day_start
+from fitbit_records import decode_bank, DailyRecord
+from fitbit_sim import minute_bank
+
+class FenwickTreeTest(unittest.TestCase):
+
+    def test_matches_list(self):
+        r = random.Random(0)
+        tree = FenwickTree()
+        values = []
+        for n in range(300):
+            action = r.random()
+            if action < 0.5 or not values:
+                v = r.randint(0, 50)
+                tree.append(v)
+                values.append(v)
+            elif action < 0.6:
+                count = r.randint(1, 10)
+                tree.prepend(count)
+                values[0:0] = [0] * count
+            elif action < 0.8:
+                i = r.randrange(len(values))
+                v = r.randint(0, 50)
+                tree.set(i, v)
+                values[i] = v
+            else:
+                i = r.randrange(len(values))
+                tree.add(i, 3)
+                values[i] += 3
+            start = r.randint(-2, len(values))
+            end = r.randint(start, len(values) + 2)
+            self.assertEqual(tree.range_sum(start, end),
+                             sum(values[max(start, 0):end]))
+        self.assertEqual(tree.values, values)
+
+class TrackerRollupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.start = day_start(1300000000) + 3600
+        self.rollup = TrackerRollup()
+        # Later hours first, so the series also grows backwards
+        self.rollup.add_records(decode_bank(0x00, minute_bank(self.start + 3600, 2, 5)))
+        self.rollup.add_records(decode_bank(0x00, minute_bank(self.start, 1, 7)))
+
+    def test_sum(self):
+        self.assertEqual(self.rollup.sum("steps", self.start, self.start + 3 * 3600),
+                         60 * 7 + 120 * 5)
+        self.assertEqual(self.rollup.sum("steps", self.start + 3600, self.start + 3660), 5)
+        self.assertEqual(self.rollup.sum("steps", self.start - 3600, self.start), 0)
+
+    def test_hourly(self):
+        self.assertEqual(self.rollup.hourly("steps", self.start, self.start + 3 * 3600),
+                         [(self.start, 420), (self.start + 3600, 300),
+                          (self.start + 7200, 300)])
+
+    def test_check_daily(self):
+        day = day_start(self.start)
+        self.assertEqual(self.rollup.check_daily([DailyRecord(day, 1020)]), [])
+        self.assertEqual(self.rollup.check_daily([DailyRecord(day, 1000)]),
+                         [(day, 1020, 1000)])
+
+if __name__ == '__main__':
+    unittest.main()